@@ -2,13 +2,33 @@ import streamlit as st
 from datetime import date
 import datetime
 import sqlite3
-from auth_utils import init_database, authenticate_user, add_user, load_users
-from task_utils import init_task_database, create_task, update_task_status, get_user_tasks, get_user_task_stats, \
-    get_task_messages, create_message
-from config import DATABASE_PATH
+from auth_utils import authenticate_user, add_user, get_user_directory, invalidate_user_directory
+from task_utils import create_task, get_task, get_user_tasks, get_user_tasks_page, get_user_task_stats, \
+    get_team_stats, get_team_workload, check_user_task_stats, rebuild_user_task_stats, get_task_messages, \
+    get_messages_for_tasks, create_message, task_transaction
+from config import TASK_PAGE_SIZE, TABLE_PAGE_SIZE, CHAT_WINDOW_SIZE, SQL_CONSOLE_MAX_ROWS, \
+    SQL_CONSOLE_MAX_BYTES, SQL_CONSOLE_TIMEOUT, SQL_EXPORT_TIMEOUT, BACKUP_DIR, SQL_PROFILING
+from schema_utils import ensure_schema
+from db_utils import get_pool_stats
+from cache_utils import get_cache_stats
+from queue_utils import get_write_queue_stats
+from import_utils import IMPORT_FORMATS, detect_format, import_tasks
+from sync_utils import diff_frames, apply_table_changes
+from table_utils import ROWID_COLUMN, list_tables, get_table_columns, fetch_table_page, estimate_row_count, \
+    count_matching_rows
+from console_utils import QueryTimeout, explain_query_plan, run_select, run_statement, export_csv
+from backup_utils import start_backup, get_backup_job, list_backups, restore_backup
+from table_stats_utils import table_stats, get_table_stats, analyze_database
+from instrument_utils import query_log, start_rerun, summarize_queries, rerun_query_counts
+from trace_utils import traced, start_trace, finish_trace, profiled, rerun_latencies, LATENCY_BUCKETS
+from metrics_utils import registry as metrics_registry, reruns_total, rerun_duration, touch_session, \
+    start_exporters
 import pandas as pd
-import shutil
 import os
+import tempfile
+import time
+import uuid
+from collections import deque
 
 
 def main_page():
@@ -21,13 +41,20 @@ def main_page():
         st.session_state.authenticated = False
         st.session_state.username = None
         st.session_state.role = None
+        st.session_state.pop('task_pages', None)
+        st.session_state.pop('live_chats', None)
         st.rerun()
 
+    # Cards only re-read their own data during fragment reruns
+    st.session_state.refreshed_cards = set()
+    show_render_timings()
+    show_rerun_profile()
+
     # Modify menu based on roles
     if st.session_state.role == 'boss':
         menu = st.sidebar.selectbox(
             "Menu",
-            ["Tasks", "Create Task", "Team Overview", "Self-Assign Task"]
+            ["Tasks", "Create Task", "Import Tasks", "Team Overview", "Self-Assign Task"]
         )
     elif st.session_state.role == 'database':
         menu = st.sidebar.selectbox(
@@ -39,6 +66,8 @@ def main_page():
             "Menu",
             ["Tasks", "Create Task", "Self-Assign Task"]
         )
+    # Read back by main() to label this rerun, even when it ends in st.rerun()
+    st.session_state.current_menu = menu
 
     if menu == "Tasks":
         st.markdown(
@@ -58,13 +87,19 @@ def main_page():
             """,
             unsafe_allow_html=True
         )
-        tasks = get_user_tasks(st.session_state.username, st.session_state.role)
+        tasks, next_cursor = load_dashboard_tasks(st.session_state.username, st.session_state.role)
 
         if not tasks:
             st.info("No tasks found.")
         else:
+            # One query for every visible card's chat instead of one per card
+            messages_by_task = get_messages_for_tasks(list(tasks), per_task_limit=CHAT_WINDOW_SIZE)
             for task_id, task in tasks.items():
-                display_task_card(task_id, task)
+                display_task_card(task_id, task, messages=messages_by_task[task_id])
+
+            if next_cursor and st.button("Load more tasks"):
+                st.session_state.task_pages += 1
+                st.rerun()
 
     elif menu == "Database Management" and st.session_state.role == 'database':
         database_management_page()
@@ -90,8 +125,7 @@ def main_page():
         with st.form(key="create_task_form"):
             title = st.text_input("Task Title")
             description = st.text_area("Task Description")
-            users = load_users()
-            team_members = [user for user, data in users.items() if data['role'] == 'member']
+            team_members = get_user_directory().users(role='member')
             assigned_to = st.multiselect("Assign To", team_members)
             due_date = st.date_input("Due Date", min_value=date.today())
 
@@ -128,12 +162,18 @@ def main_page():
             """,
             unsafe_allow_html=True
         )
-        users = load_users()
-        team_members = [user for user, data in users.items() if data['role'] == 'member']
+        team_stats = get_team_stats()
+        team_workload_dashboard(team_stats)
+
+        member_prefix = st.text_input("Filter members by name prefix")
+        team_members = get_user_directory().with_prefix(member_prefix, role='member')
 
         selected_member = st.selectbox("Select Team Member", team_members)
         if selected_member:
-            view_member_profile(selected_member)
+            view_member_profile(selected_member, stats=team_stats.get(selected_member))
+
+    elif menu == "Import Tasks" and st.session_state.role == 'boss':
+        import_tasks_page()
 
     elif menu == "Self-Assign Task":
         st.markdown(
@@ -161,21 +201,23 @@ def main_page():
             submitted = st.form_submit_button("Self-Assign Task")
             if submitted:
                 if title and description:
-                    task_id = create_task(
-                        title,
-                        description,
-                        st.session_state.username,  # Boss assigns task
-                        [st.session_state.username],  # Self-assign
-                        due_date.isoformat()
-                    )
+                    # Task and its creation log entry are written in one commit
+                    with task_transaction() as tx:
+                        task_id = tx.create_task(
+                            title,
+                            description,
+                            st.session_state.username,  # Boss assigns task
+                            [st.session_state.username],  # Self-assign
+                            due_date.isoformat()
+                        )
 
-                    # Create a system message to log task creation
-                    create_message(
-                        task_id,
-                        'System',
-                        f"Task self-assigned by {st.session_state.username}",
-                        message_type='system'
-                    )
+                        # Create a system message to log task creation
+                        tx.create_message(
+                            task_id,
+                            'System',
+                            f"Task self-assigned by {st.session_state.username}",
+                            message_type='system'
+                        )
 
                     st.success("Task self-assigned successfully")
                     st.rerun()
@@ -254,6 +296,133 @@ def init_session_state():
         st.session_state.username = None
     if 'role' not in st.session_state:
         st.session_state.role = None
+    if 'session_id' not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+
+
+@traced(kind='fetch')
+def load_dashboard_tasks(username, role):
+    """
+    Fetch the task pages opened so far on the Tasks dashboard
+
+    Pages are read by keyset cursor, so a rerun costs the number of tasks on
+    screen rather than the user's whole task history. Only the page count is
+    kept: each page starts after the last task of the page just read, so new
+    tasks shift later pages instead of hiding the tasks pushed across a
+    page boundary.
+    """
+    if 'task_pages' not in st.session_state:
+        st.session_state.task_pages = 1
+
+    tasks = {}
+    next_cursor = None
+    for _ in range(st.session_state.task_pages):
+        page, next_cursor = get_user_tasks_page(username, role, after=next_cursor, limit=TASK_PAGE_SIZE)
+        tasks.update(page)
+        if next_cursor is None:
+            break
+    return tasks, next_cursor
+
+
+@traced(kind='fetch')
+def load_task_chat(task_id, messages=None):
+    """
+    Messages to render in a task card's chat, oldest first
+
+    Live chats (a card that loaded older messages or was refreshed after a send)
+    are kept in session state and only read messages newer than the last one held.
+    Other cards show the latest window, prefetched by the dashboard when given.
+    """
+    live_chats = st.session_state.setdefault('live_chats', {})
+    if task_id in live_chats:
+        chat = live_chats[task_id]
+        last_id = chat[-1]['message_id'] if chat else 0
+        chat.extend(get_task_messages(task_id, since_message_id=last_id))
+        return chat
+
+    if messages is None:
+        messages = get_task_messages(task_id, last_n=CHAT_WINDOW_SIZE)
+    return messages
+
+
+def load_older_messages(task_id, chat):
+    """Prepend the previous window of messages to a card's chat"""
+    before_id = chat[0]['message_id'] if chat else None
+    older = get_task_messages(task_id, last_n=CHAT_WINDOW_SIZE, before_message_id=before_id)
+    st.session_state.setdefault('live_chats', {})[task_id] = older + chat
+
+
+def refresh_task_card(task_id, chat):
+    """Rerun only this card's fragment, re-reading its task and new messages"""
+    st.session_state.setdefault('refreshed_cards', set()).add(task_id)
+    st.session_state.setdefault('live_chats', {}).setdefault(task_id, list(chat))
+    st.rerun(scope="fragment")
+
+
+def record_render_timing(kind, seconds):
+    """Keep the last 50 render durations per kind ('full_rerun' or 'fragment')"""
+    timings = st.session_state.setdefault('render_timings', {})
+    timings.setdefault(kind, deque(maxlen=50)).append(seconds)
+
+
+def show_render_timings():
+    """Sidebar comparison of full-rerun vs fragment render cost"""
+    timings = st.session_state.get('render_timings', {})
+    with st.sidebar.expander("Render timings"):
+        for kind, label in [('full_rerun', "Full rerun"), ('fragment', "Card fragment")]:
+            samples = timings.get(kind)
+            if samples:
+                st.write(f"{label}: {sum(samples) / len(samples) * 1000:.1f} ms avg "
+                         f"over {len(samples)} (last {samples[-1] * 1000:.1f} ms)")
+            else:
+                st.write(f"{label}: no samples yet")
+        for name, counters in get_cache_stats().items():
+            st.write(f"{name} cache: {counters['hits']} hits / {counters['misses']} misses")
+        pool_stats = get_pool_stats()
+        st.write(f"Lock contention: {pool_stats['busy_retries']} busy retries, "
+                 f"{pool_stats['lock_wait_time'] * 1000:.1f} ms waiting for the write lock")
+        queue_stats = get_write_queue_stats()
+        st.write(f"Write queue: depth {queue_stats['depth']}, "
+                 f"{queue_stats['avg_batch_size']:.1f} writes per commit, "
+                 f"{queue_stats['commit_time_avg'] * 1000:.1f} ms avg commit")
+
+
+def show_rerun_profile():
+    """Sidebar breakdown of the previous rerun, per-page latency and cProfile capture"""
+    with st.sidebar.expander("Rerun profile"):
+        trace = st.session_state.get('last_trace')
+        if trace is not None:
+            breakdown = trace.breakdown()
+            st.write(f"Last rerun: {trace.duration * 1000:.1f} ms (" + ", ".join(
+                f"{kind} {seconds * 1000:.1f} ms" for kind, seconds in sorted(breakdown.items())
+            ) + ")")
+            spans = sorted(trace.by_name().items(), key=lambda item: item[1][2], reverse=True)
+            st.dataframe(pd.DataFrame([
+                {"Span": name, "Calls": calls, "Total ms": round(total * 1000, 1), "Self ms": round(own * 1000, 1)}
+                for name, (calls, total, own) in spans
+            ]), hide_index=True)
+
+        percentiles = rerun_latencies.percentiles()
+        if percentiles:
+            st.dataframe(pd.DataFrame([
+                {"Page": label, "Reruns": stats['count'], "p50 ms": round(stats['p50'] * 1000, 1),
+                 "p95 ms": round(stats['p95'] * 1000, 1), "Max ms": round(stats['max'] * 1000, 1)}
+                for label, stats in sorted(percentiles.items())
+            ]), hide_index=True)
+            page = st.selectbox("Latency histogram", sorted(percentiles))
+            st.bar_chart(pd.Series(
+                rerun_latencies.histogram(page),
+                index=[f"<= {bound:g} ms" if bound != float('inf') else "slower" for bound in LATENCY_BUCKETS]
+            ))
+
+        if st.button("Profile next rerun"):
+            st.session_state.profile_next_rerun = True
+            st.rerun()
+        if st.session_state.get('profile_skipped'):
+            st.caption("Another rerun was being profiled, so the last one was not; try again.")
+        if st.session_state.get('last_profile'):
+            st.download_button("Download .prof", data=st.session_state.last_profile,
+                               file_name="rerun.prof", mime="application/octet-stream")
 
 
 def reset_form_fields():
@@ -263,7 +432,61 @@ def reset_form_fields():
 
 
 
-def view_member_profile(username):
+@traced(kind='compute')
+def build_workload_frames(team_stats, workload_rows):
+    """
+    Pivot team statistics into the Team Overview tables
+
+    Args:
+        team_stats: get_team_stats() result
+        workload_rows: get_team_workload() result
+
+    Returns:
+        (summary, by_week) DataFrames indexed by member: status counts plus
+        open/overdue totals, and open tasks per due week
+    """
+    summary = pd.DataFrame.from_dict(team_stats, orient='index').rename_axis('member')
+    workload = pd.DataFrame(workload_rows, columns=['member', 'due_week', 'open_tasks', 'overdue'])
+
+    totals = workload.groupby('member')[['open_tasks', 'overdue']].sum()
+    summary = summary.join(totals).fillna({'open_tasks': 0, 'overdue': 0}).astype(int)
+
+    if workload.empty:
+        by_week = pd.DataFrame(index=summary.index)
+    else:
+        by_week = workload.pivot_table(
+            index='member', columns='due_week', values='open_tasks', aggfunc='sum', fill_value=0
+        ).reindex(summary.index, fill_value=0)
+        by_week.columns.name = None
+    return summary, by_week
+
+
+@traced(kind='render')
+def team_workload_dashboard(team_stats):
+    """All-members workload view: status counts, overdue tasks and open tasks by due week"""
+    if not team_stats:
+        st.info("No team members found.")
+        return
+
+    summary, by_week = build_workload_frames(team_stats, get_team_workload(date.today().isoformat()))
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Members", len(summary))
+    col2.metric("Open Tasks", int(summary['open_tasks'].sum()))
+    col3.metric("Overdue Tasks", int(summary['overdue'].sum()))
+
+    st.subheader("Workload by Member")
+    only_overdue = st.checkbox("Only members with overdue tasks")
+    if only_overdue:
+        summary = summary[summary['overdue'] > 0]
+    st.dataframe(summary.sort_values(['overdue', 'open_tasks'], ascending=False), use_container_width=True)
+
+    st.subheader("Open Tasks by Due Week")
+    st.dataframe(by_week.loc[summary.index], use_container_width=True)
+
+
+@traced(kind='render')
+def view_member_profile(username, stats=None):
     st.markdown("""
     <style>
     .profile-container {
@@ -392,7 +615,8 @@ def view_member_profile(username):
 
     # Fetch user tasks and stats
     tasks = get_user_tasks(username, "member")
-    stats = get_user_task_stats(username)
+    if stats is None:
+        stats = get_user_task_stats(username)
 
     st.markdown(f"""
     <div class="profile-container">
@@ -490,7 +714,51 @@ def login_page():
                     st.error("Please fill all fields")
 
 
-def display_task_card(task_id, task, context="main"):
+@traced(kind='render')
+def import_tasks_page():
+    """Bulk-create tasks from an uploaded CSV, JSON or JSON Lines file"""
+    st.title("Import Tasks")
+    st.markdown(
+        "Columns / keys: **title**, **description**, **assigned_to** (comma-separated), "
+        "**due_date** (YYYY-MM-DD), optional **assigned_by** and **status**."
+    )
+
+    uploaded = st.file_uploader("Task file", type=list(IMPORT_FORMATS))
+    if uploaded is not None and st.button("Import"):
+        try:
+            fmt = detect_format(uploaded.name)
+        except ValueError as e:
+            st.error(str(e))
+            return
+
+        progress_bar = st.progress(0.0)
+        status_text = st.empty()
+        total_bytes = max(uploaded.size, 1)
+
+        committed = {'created': 0}
+
+        def report(rows_seen, created, errors):
+            committed['created'] = created
+            progress_bar.progress(min(uploaded.tell() / total_bytes, 1.0))
+            status_text.write(f"{rows_seen} rows read, {created} created, {errors} errors")
+
+        try:
+            result = import_tasks(uploaded, fmt, st.session_state.username, progress=report)
+        except (ValueError, UnicodeDecodeError) as e:
+            # Chunks are committed as they go, so say what was already imported
+            st.error(f"Could not read file: {e}. "
+                     f"{committed['created']} tasks created before the error were kept.")
+            return
+
+        progress_bar.progress(1.0)
+        st.success(f"Created {len(result['created'])} tasks")
+        if result['errors']:
+            st.warning(f"{len(result['errors'])} rows were skipped")
+            st.dataframe(pd.DataFrame(result['errors'], columns=["Row", "Error"]))
+
+
+@traced(kind='render')
+def display_task_card(task_id, task, context="main", messages=None):
     st.markdown("""
     <style>
     /* Global Styles */
@@ -769,6 +1037,24 @@ def display_task_card(task_id, task, context="main"):
     </style>
     """, unsafe_allow_html=True)
 
+    task_card_fragment(task_id, task, messages)
+
+
+@st.fragment
+def task_card_fragment(task_id, task, messages=None):
+    """
+    Render the body of a task card as a Streamlit fragment
+
+    Sending a message, changing the status or loading older messages reruns only
+    this card. Cards refreshed that way re-read their task and chat through the
+    per-task loaders instead of the arguments from the last full rerun.
+    """
+    started = time.perf_counter()
+    refreshed = task_id in st.session_state.setdefault('refreshed_cards', set())
+    if refreshed:
+        start_rerun('fragment')
+        task = get_task(task_id) or task
+
     def get_status_badge_class(status):
         badge_classes = {
             'pending': 'badge-pending',
@@ -778,8 +1064,7 @@ def display_task_card(task_id, task, context="main"):
         }
         return badge_classes.get(status, 'badge-pending')
 
-        # Task Card with Expandable Details
-
+    # Task Card with Expandable Details
     with st.container():
         # Task Header
         st.markdown(f"""
@@ -805,8 +1090,13 @@ def display_task_card(task_id, task, context="main"):
              </div>
              """, unsafe_allow_html=True)
 
-            # Chat Section
-            messages = get_task_messages(task_id)
+            # Chat Section (uses the dashboard's prefetched messages when given)
+            messages = load_task_chat(task_id, messages)
+            if len(messages) < task['message_count']:
+                st.caption(f"Showing the latest {len(messages)} of {task['message_count']} messages")
+                if st.button("Load older messages", key=f'load_older_{task_id}'):
+                    load_older_messages(task_id, messages)
+                    st.rerun(scope="fragment")
             for msg in messages:
                 message_class = "message-bubble"
                 if msg['sender'] == 'System':
@@ -840,7 +1130,7 @@ def display_task_card(task_id, task, context="main"):
 
                 if submit_message and message:
                     create_message(task_id, st.session_state.username, message)
-                    st.rerun()
+                    refresh_task_card(task_id, messages)
 
             st.markdown('</div>', unsafe_allow_html=True)
 
@@ -863,100 +1153,161 @@ def display_task_card(task_id, task, context="main"):
 
                 if new_status != task['status']:
                     if st.button("Update Status", key=f'update_status_{task_id}'):
-                        update_task_status(task_id, new_status)
-
-                        # Create a system message to log status change
-                        create_message(
-                            task_id,
-                            'System',
-                            f"Task status changed from {task['status']} to {new_status}",
-                            message_type='system'
-                        )
-                        st.rerun()
+                        # Status change and its log message commit together
+                        with task_transaction() as tx:
+                            tx.update_task_status(task_id, new_status)
+
+                            # Create a system message to log status change
+                            tx.create_message(
+                                task_id,
+                                'System',
+                                f"Task status changed from {task['status']} to {new_status}",
+                                message_type='system'
+                            )
+                        refresh_task_card(task_id, messages)
 
                 st.markdown('</div>', unsafe_allow_html=True)
 
+    if refreshed:
+        record_render_timing('fragment', time.perf_counter() - started)
+
 
 def database_backup_restore():
     """Backup and restore database functionality"""
-    # Ensure data directory exists
-    os.makedirs("data", exist_ok=True)
-
     col1, col2 = st.columns(2)
 
     with col1:
         st.subheader("Backup Database")
+        compress = st.checkbox("Compress backup (gzip)")
         if st.button("Create Backup"):
-            try:
-                backup_filename = f"backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
-                backup_path = os.path.join("data", backup_filename)
-                shutil.copy(DATABASE_PATH, backup_path)
-                st.success(f"Database backed up to {backup_filename}")
-            except Exception as e:
-                st.error(f"Backup failed: {e}")
+            job = get_backup_job()
+            if job is not None and job.running:
+                st.info("A backup is already in progress")
+            else:
+                start_backup(compress)
+
+        job = get_backup_job()
+        if job is not None and job.running:
+            backup_progress()
+        elif job is not None:
+            show_backup_status(job)
 
     with col2:
         st.subheader("Restore Database")
-        backup_files = [f for f in os.listdir("data") if f.startswith("backup_") and f.endswith(".db")]
+        backup_files = [path.name for path in list_backups()]
 
         if backup_files:
             selected_backup = st.selectbox("Select Backup", backup_files)
 
             if st.button("Restore Selected Backup"):
                 try:
-                    backup_path = os.path.join("data", selected_backup)
-                    shutil.copy(backup_path, DATABASE_PATH)
-                    st.success("Database restored successfully")
+                    with st.spinner("Validating and restoring backup..."):
+                        started = time.perf_counter()
+                        version = restore_backup(BACKUP_DIR / selected_backup)
+                    st.success(
+                        f"Database restored from schema version {version} "
+                        f"in {time.perf_counter() - started:.1f}s"
+                    )
                 except Exception as e:
                     st.error(f"Restore failed: {e}")
         else:
             st.info("No backup files found")
 
 
+@st.fragment(run_every=1.0)
+def backup_progress():
+    """Progress of the running background backup, refreshed every second"""
+    job = get_backup_job()
+    if job is None or not job.running:
+        # Rerun the page once so this polling fragment is no longer drawn
+        st.rerun()
+    show_backup_status(job)
+
+
+def show_backup_status(job):
+    """Progress bar, result or error of a backup job"""
+    if job.running:
+        label = "Compressing backup" if job.status == 'compressing' else \
+            f"Backing up: {job.pages_done} of {job.pages_total} pages"
+        st.progress(job.progress, text=label)
+    elif job.status == 'done':
+        st.success(f"Database backed up to {job.path.name} in {job.finished - job.started:.1f}s")
+    else:
+        st.error(f"Backup failed: {job.error}")
+
+
+@traced(kind='render')
 def view_database_tables(selected_table):
-    """Enhanced function to view and interact with database tables"""
-    with sqlite3.connect(DATABASE_PATH) as conn:
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+    """Browse a table one page at a time, with filters and sorting done in SQL"""
+    if not selected_table:
+        return
 
-        try:
-            # Fetch table columns
-            cursor.execute(f"PRAGMA table_info({selected_table})")
-            columns = [column[1] for column in cursor.fetchall()]
-
-            # Fetch all data
-            cursor.execute(f"SELECT * FROM {selected_table}")
-            rows = cursor.fetchall()
-
-            if rows:
-                # Convert rows to list of dictionaries
-                data = [dict(row) for row in rows]
-                df = pd.DataFrame(data)
-
-                # Identify primary key column (first column)
-                primary_key = columns[0] if columns else None
-
-                # Display editable dataframe
-                edited_df = st.data_editor(
-                    df,
-                    num_rows="dynamic",  # Allow adding/deleting rows
-                    column_config={
-                        primary_key: st.column_config.TextColumn(disabled=True) if primary_key else None
-                    } if primary_key else {}
-                )
+    try:
+        columns = get_table_columns(selected_table)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            filter_columns = st.multiselect("Filter columns", columns, key=f"filter_columns_{selected_table}")
+        with col2:
+            sort_column = st.selectbox("Sort by", ["(row order)"] + columns, key=f"sort_{selected_table}")
+            descending = st.checkbox("Descending", key=f"descending_{selected_table}")
+        filters = {
+            column: st.text_input(f"{column} contains", key=f"filter_{selected_table}_{column}")
+            for column in filter_columns
+        }
+        sort_column = None if sort_column == "(row order)" else sort_column
+
+        # Start from the first page whenever the table, filters or sort change
+        signature = (selected_table, tuple(sorted(filters.items())), sort_column, descending)
+        browser = st.session_state.get('table_browser')
+        if browser is None or browser['signature'] != signature:
+            browser = {'signature': signature, 'cursors': [None]}
+            st.session_state.table_browser = browser
+
+        page_columns, rows, next_cursor = fetch_table_page(
+            selected_table, filters, sort_column, descending,
+            after=browser['cursors'][-1], limit=TABLE_PAGE_SIZE
+        )
 
-                # Detect changes
-                if st.button(f"Save Changes to {selected_table}"):
-                    update_table_data(selected_table, columns, df, edited_df)
+        if any(filters.values()):
+            matches = count_matching_rows(selected_table, filters)
+            st.caption(f"{'more than 10000' if matches > 10000 else matches} matching rows")
+        else:
+            st.caption(f"About {estimate_row_count(selected_table)} rows")
+
+        if rows:
+            df = pd.DataFrame(rows, columns=page_columns)
+
+            # Edits and deletions only apply to the rows on this page; rowid
+            # identifies them, so it cannot be edited
+            edited_df = st.data_editor(
+                df,
+                num_rows="dynamic",
+                column_config={ROWID_COLUMN: st.column_config.NumberColumn(disabled=True)},
+                key=f"table_editor_{hash(signature)}_{len(browser['cursors'])}"
+            )
+
+            if st.button(f"Save Changes to {selected_table}"):
+                update_table_data(selected_table, page_columns, df, edited_df)
+        else:
+            st.info(f"No data in {selected_table} table")
 
-                st.write(f"Total Rows: {len(rows)}")
-            else:
-                st.info(f"No data in {selected_table} table")
+        prev_col, page_col, next_col = st.columns([1, 2, 1])
+        with prev_col:
+            if len(browser['cursors']) > 1 and st.button("Previous page"):
+                browser['cursors'].pop()
+                st.rerun()
+        with page_col:
+            st.write(f"Page {len(browser['cursors'])}")
+        with next_col:
+            if next_cursor and st.button("Next page"):
+                browser['cursors'].append(next_cursor)
+                st.rerun()
 
-        except sqlite3.Error as e:
-            st.error(f"Error fetching data: {e}")
-        except Exception as e:
-            st.error(f"Unexpected error: {e}")
+    except sqlite3.Error as e:
+        st.error(f"Error fetching data: {e}")
+    except Exception as e:
+        st.error(f"Unexpected error: {e}")
 
 
 def update_table_data(table_name, columns, original_df, edited_df):
@@ -965,108 +1316,24 @@ def update_table_data(table_name, columns, original_df, edited_df):
     Maintains compatibility with existing code
     """
     success = sync_database_changes(table_name, columns, original_df, edited_df)
-    if success and table_name == 'users':
-        # Reload users data in the application
-        updated_users = reload_users_data()
     return success
 
-    if not columns:
-        st.error("No columns found in the table")
-        return
-
-    with sqlite3.connect(DATABASE_PATH) as conn:
-        cursor = conn.cursor()
-
-        try:
-            # Ensure DataFrames have consistent column names and index
-            original_df = original_df.reset_index(drop=True)
-            edited_df = edited_df.reset_index(drop=True)
-
-            # Rename columns to match the database schema
-            original_df.columns = columns
-            edited_df.columns = columns
-
-            # Assume first column is primary key
-            primary_key = columns[0]
-
-            # Detect changes
-            # Added rows
-            added_rows = edited_df[~edited_df.duplicated(subset=[primary_key], keep=False)]
-
-            # Deleted rows
-            deleted_rows = original_df[~original_df[primary_key].isin(edited_df[primary_key])]
-
-            # Modified rows (excluding primary key)
-            modified_rows = edited_df[
-                edited_df[primary_key].isin(original_df[primary_key]) &
-                ~edited_df.equals(original_df)
-                ]
-
-            # Delete rows
-            if not deleted_rows.empty:
-                for _, row in deleted_rows.iterrows():
-                    delete_query = f"DELETE FROM {table_name} WHERE {primary_key} = ?"
-                    cursor.execute(delete_query, (row[primary_key],))
-                st.success(f"Deleted {len(deleted_rows)} rows")
-
-            # Update existing rows
-            if not modified_rows.empty:
-                update_columns = [col for col in columns if col != primary_key]
-                for _, row in modified_rows.iterrows():
-                    update_query = f"""
-                    UPDATE {table_name} 
-                    SET {', '.join([f"{col} = ?" for col in update_columns])} 
-                    WHERE {primary_key} = ?
-                    """
-                    update_values = [row[col] for col in update_columns] + [row[primary_key]]
-                    cursor.execute(update_query, update_values)
-                st.success(f"Updated {len(modified_rows)} rows")
-
-            # Insert new rows
-            if not added_rows.empty:
-                for _, row in added_rows.iterrows():
-                    # Remove NaN values and handle potential issues
-                    row = row.dropna()
-
-                    # Ensure we have values for all columns
-                    insert_columns = [col for col in columns if col in row.index]
-                    insert_query = f"""
-                    INSERT INTO {table_name} ({', '.join(insert_columns)}) 
-                    VALUES ({', '.join(['?' for _ in insert_columns])})
-                    """
-                    cursor.execute(insert_query, [row[col] for col in insert_columns])
-                st.success(f"Added {len(added_rows)} new rows")
-
-            # Commit changes
-            conn.commit()
-            st.success("Database updated successfully")
-
-        except sqlite3.Error as e:
-            conn.rollback()
-            st.error(f"Database error: {e}")
-        except Exception as e:
-            conn.rollback()
-            st.error(f"Unexpected error: {e}")
-
 
 def database_management_page():
     """Enhanced Database Management Page"""
     st.title("Database Management")
 
     # Tabs for different database operations
-    tab1, tab2, tab3, tab4 = st.tabs([
+    tab1, tab2, tab3, tab4, tab5 = st.tabs([
         "Manage Tables",
         "Execute SQL Query",
         "Backup & Restore",
-        "Database Info"
+        "Database Info",
+        "Performance"
     ])
 
     with tab1:
-        # Get list of tables
-        with sqlite3.connect(DATABASE_PATH) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-            tables = [table[0] for table in cursor.fetchall()]
+        tables = list_tables()
 
         # Table selection and management
         selected_table = st.selectbox("Select Table to Manage", tables)
@@ -1077,8 +1344,13 @@ def database_management_page():
         query_type = st.selectbox("Query Type", ["SELECT", "INSERT", "UPDATE", "DELETE"])
         query = st.text_area("Enter SQL Query", height=150)
 
-        if st.button("Execute Query"):
-            execute_advanced_sql_query(query, query_type)
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("Execute Query"):
+                execute_advanced_sql_query(query, query_type)
+        with col2:
+            if query_type == "SELECT" and st.button("Export Full Result as CSV"):
+                export_sql_query(query)
 
     with tab3:
         database_backup_restore()
@@ -1086,76 +1358,216 @@ def database_management_page():
     with tab4:
         display_database_info()
 
+    with tab5:
+        display_query_performance()
+
 
 def execute_advanced_sql_query(query, query_type):
-    """Enhanced SQL query execution with better error handling and results display"""
+    """Run a console query with row, size and time limits, showing its plan and timing"""
     try:
-        with sqlite3.connect(DATABASE_PATH) as conn:
-            cursor = conn.cursor()
-
-            # Validate query type
-            if not query.upper().startswith(query_type):
-                st.error(f"Query must start with {query_type}")
-                return
-
-            # Execute query
-            cursor.execute(query)
-
-            if query_type == "SELECT":
-                rows = cursor.fetchall()
-                if rows:
-                    # Get column names
-                    column_names = [description[0] for description in cursor.description]
-
-                    # Convert to DataFrame
-                    df = pd.DataFrame(rows, columns=column_names)
-                    st.dataframe(df)
-                    st.write(f"Total Rows: {len(rows)}")
-                else:
-                    st.info("No results found")
+        # Validate query type
+        if not query.strip().upper().startswith(query_type):
+            st.error(f"Query must start with {query_type}")
+            return
+
+        with st.expander("Query Plan"):
+            st.code("\n".join(explain_query_plan(query)) or "(no plan)")
+
+        if query_type == "SELECT":
+            result = run_select(query, SQL_CONSOLE_MAX_ROWS, SQL_CONSOLE_MAX_BYTES, SQL_CONSOLE_TIMEOUT)
+            st.caption(f"Executed in {result['elapsed'] * 1000:.1f} ms")
+            if result['rows']:
+                st.dataframe(pd.DataFrame(result['rows'], columns=result['columns']))
+                st.write(f"Rows shown: {len(result['rows'])}")
+                if result['truncated'] == 'rows':
+                    st.warning(f"Showing the first {SQL_CONSOLE_MAX_ROWS} rows; export to CSV for the full result")
+                elif result['truncated'] == 'bytes':
+                    st.warning("Result too large to show in full; export to CSV for the full result")
             else:
-                # For INSERT, UPDATE, DELETE
-                conn.commit()
-                st.success(f"{query_type} query executed successfully. Rows affected: {cursor.rowcount}")
-
+                st.info("No results found")
+        else:
+            # For INSERT, UPDATE, DELETE
+            result = run_statement(query, SQL_CONSOLE_TIMEOUT)
+            # The statement may have touched the users table
+            invalidate_user_directory()
+            st.caption(f"Executed in {result['elapsed'] * 1000:.1f} ms")
+            st.success(f"{query_type} query executed successfully. Rows affected: {result['rowcount']}")
+
+    except QueryTimeout as e:
+        st.error(str(e))
     except sqlite3.Error as e:
         st.error(f"Database error: {e}")
     except Exception as e:
         st.error(f"An error occurred: {e}")
 
 
+def export_sql_query(query):
+    """Stream a SELECT's full result into a CSV file and offer it for download"""
+    if not query.strip().upper().startswith("SELECT"):
+        st.error("Only SELECT queries can be exported")
+        return
+
+    # Replace this session's previous export instead of accumulating files
+    previous = st.session_state.pop('sql_export_path', None)
+    if previous and os.path.exists(previous):
+        os.remove(previous)
+    fd, path = tempfile.mkstemp(prefix="query_export_", suffix=".csv")
+    os.close(fd)
+    st.session_state.sql_export_path = path
+
+    try:
+        count = export_csv(query, path, SQL_EXPORT_TIMEOUT)
+    except QueryTimeout as e:
+        st.error(str(e))
+        return
+    except sqlite3.Error as e:
+        st.error(f"Database error: {e}")
+        return
+
+    with open(path, "rb") as export:
+        st.download_button(
+            f"Download CSV ({count} rows)",
+            data=export,
+            file_name="query_result.csv",
+            mime="text/csv"
+        )
+
+
+def display_query_performance():
+    """Slowest and most frequent SQL statements from the in-memory query log"""
+    st.download_button("Download metrics (Prometheus format)", metrics_registry.expose(),
+                       file_name="taskmgr_metrics.prom", mime="text/plain")
+
+    if not SQL_PROFILING:
+        st.info("SQL profiling is disabled (set SQL_PROFILING=1 to enable it)")
+        return
+
+    col1, col2 = st.columns(2)
+    with col1:
+        top_n = st.slider("Statements to show", 5, 50, 10)
+    with col2:
+        rank_by = st.selectbox("Rank slow statements by", ["total", "avg", "max"])
+
+    summary = summarize_queries()
+    if not summary:
+        st.info("No statements recorded yet")
+        return
+
+    def statements_frame(entries):
+        return pd.DataFrame([{
+            "SQL": entry['sql'],
+            "Calls": entry['count'],
+            "Total ms": round(entry['total'] * 1000, 2),
+            "Avg ms": round(entry['avg'] * 1000, 3),
+            "Max ms": round(entry['max'] * 1000, 3),
+            "Rows": entry['rows'],
+            "Call sites": ", ".join(sorted(entry['sites']))
+        } for entry in entries])
+
+    st.subheader("Slowest Statements")
+    st.dataframe(statements_frame(sorted(summary, key=lambda e: e[rank_by], reverse=True)[:top_n]),
+                 use_container_width=True)
+
+    st.subheader("Most Frequent Statements")
+    st.dataframe(statements_frame(sorted(summary, key=lambda e: e['count'], reverse=True)[:top_n]),
+                 use_container_width=True)
+
+    st.subheader("Queries per Rerun")
+    reruns = rerun_query_counts()
+    if reruns:
+        st.dataframe(pd.DataFrame([{
+            "Rerun": rerun['rerun'],
+            "Kind": rerun['kind'],
+            "Started": datetime.datetime.fromtimestamp(rerun['at']).strftime("%H:%M:%S"),
+            "Queries": rerun['queries'],
+            "SQL ms": round(rerun['sql_time'] * 1000, 2)
+        } for rerun in reruns[:top_n]]), use_container_width=True)
+
+    if st.button("Reset query log"):
+        query_log.clear()
+        st.rerun()
+
+
+def format_bytes(size):
+    """Human readable byte count, e.g. 1.5 MB"""
+    if size is None:
+        return "n/a"
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+@traced(kind='render')
 def display_database_info():
     """Display detailed information about the database"""
-    with sqlite3.connect(DATABASE_PATH) as conn:
-        cursor = conn.cursor()
-
-        # Get table information
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        tables = cursor.fetchall()
-
-        st.subheader("Database Tables")
-        for table in tables:
-            table_name = table[0]
-
-            # Get table structure
-            cursor.execute(f"PRAGMA table_info({table_name})")
-            columns = cursor.fetchall()
-
-            # Count rows
-            cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
-            row_count = cursor.fetchone()[0]
-
-            with st.expander(f"{table_name} - {row_count} rows"):
-                st.markdown("**Columns:**")
-                column_data = []
-                for col in columns:
-                    column_data.append({
-                        "Name": col[1],
-                        "Type": col[2],
-                        "Primary Key": "Yes" if col[5] else "No",
-                        "Nullable": "Yes" if col[3] == 0 else "No"
-                    })
-                st.table(column_data)
+    stats = get_table_stats()
+    if stats is None:
+        # Only the first visit after startup waits for a collection
+        with st.spinner("Collecting table statistics..."):
+            stats = table_stats.refresh(wait=True)
+    if stats is None:
+        st.error(f"Could not collect table statistics: {table_stats.error}")
+        return
+
+    database = stats['database']
+    st.subheader("Database Storage")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("File size", format_bytes(database['file_bytes']))
+    col2.metric("Free pages", f"{database['freelist_count']} ({format_bytes(database['free_bytes'])})")
+    col3.metric("Fragmentation", f"{database['fragmentation']:.1%}")
+    collected = datetime.datetime.fromtimestamp(stats['collected']).strftime("%H:%M:%S")
+    st.caption(f"Collected at {collected}" + (" - refreshing in the background" if table_stats.refreshing else "")
+               + ("" if stats['dbstat'] else " - page usage unavailable (SQLite built without dbstat)"))
+
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("Refresh statistics"):
+            table_stats.refresh(wait=True)
+            st.rerun()
+    with col2:
+        if st.button("Update row estimates (ANALYZE)"):
+            with st.spinner("Analyzing..."):
+                analyze_database()
+                table_stats.refresh(wait=True)
+            st.rerun()
+
+    st.subheader("Database Tables")
+    for table in stats['tables']:
+        rows = "?" if table['rows'] is None else f"~{table['rows']}"
+        with st.expander(f"{table['name']} - {rows} rows, {format_bytes(table['bytes'])}"):
+            st.markdown("**Columns:**")
+            st.table([{
+                "Name": col['name'],
+                "Type": col['type'],
+                "Primary Key": "Yes" if col['pk'] else "No",
+                "Nullable": "No" if col['notnull'] else "Yes"
+            } for col in table['columns']])
+
+            if table['pages'] is not None:
+                st.markdown("**Storage:**")
+                st.table([{
+                    "B-tree": btree['name'],
+                    "Pages": btree['pages'],
+                    "Size": format_bytes(btree['bytes']),
+                    "Payload": format_bytes(btree['payload']),
+                    "Unused": format_bytes(btree['unused'])
+                } for btree in [table] + table['indexes']])
+
+    st.subheader("Task Statistics")
+    if st.button("Check user_task_stats consistency"):
+        mismatches = check_user_task_stats()
+        if not mismatches:
+            st.success("user_task_stats matches tasks and task_assignments")
+        else:
+            st.warning(f"{len(mismatches)} users have drifted statistics")
+            st.table([
+                {"User": username, "Stored": stored, "Expected": expected}
+                for username, stored, expected in mismatches
+            ])
+    if st.button("Rebuild user_task_stats"):
+        written = rebuild_user_task_stats()
+        st.success(f"Rebuilt statistics for {written} users")
 
 
 def sync_database_changes(table_name, columns, original_df, edited_df):
@@ -1175,137 +1587,87 @@ def sync_database_changes(table_name, columns, original_df, edited_df):
         st.error("No columns found in the table")
         return False
 
-    with sqlite3.connect(DATABASE_PATH) as conn:
-        cursor = conn.cursor()
-
-        try:
-            # Ensure DataFrames have consistent column names and index
-            original_df = original_df.reset_index(drop=True)
-            edited_df = edited_df.reset_index(drop=True)
-
-            # Rename columns to match the database schema
-            original_df.columns = columns
-            edited_df.columns = columns
-
-            # Assume first column is primary key
-            primary_key = columns[0]
-
-            # Comprehensive change detection
-            def detect_changes(orig_df, edit_df):
-                # Convert DataFrames to dict for easier comparison
-                orig_records = orig_df.to_dict('records')
-                edit_records = edit_df.to_dict('records')
-
-                # Separate changes
-                to_delete = [
-                    record for record in orig_records
-                    if record[primary_key] not in edit_df[primary_key].values
-                ]
+    try:
+        # Ensure DataFrames have consistent column names and index
+        original_df = original_df.reset_index(drop=True)
+        edited_df = edited_df.reset_index(drop=True)
 
-                to_update = [
-                    record for record in edit_records
-                    if record[primary_key] in orig_df[primary_key].values and
-                       any(orig_record[primary_key] == record[primary_key] and
-                           orig_record != record
-                           for orig_record in orig_records)
-                ]
+        # Rename columns to match the database schema
+        original_df.columns = columns
+        edited_df.columns = columns
 
-                to_insert = [
-                    record for record in edit_records
-                    if record[primary_key] not in orig_df[primary_key].values
-                ]
+        # Assume first column is primary key
+        primary_key = columns[0]
 
-                return to_delete, to_update, to_insert
-
-            # Detect changes
-            to_delete, to_update, to_insert = detect_changes(original_df, edited_df)
-
-            # Delete rows
-            if to_delete:
-                for record in to_delete:
-                    delete_query = f"DELETE FROM {table_name} WHERE {primary_key} = ?"
-                    cursor.execute(delete_query, (record[primary_key],))
-                st.success(f"Deleted {len(to_delete)} rows")
-
-            # Update existing rows
-            if to_update:
-                update_columns = [col for col in columns if col != primary_key]
-                for record in to_update:
-                    update_query = f"""
-                    UPDATE {table_name} 
-                    SET {', '.join([f"{col} = ?" for col in update_columns])} 
-                    WHERE {primary_key} = ?
-                    """
-                    update_values = [record[col] for col in update_columns] + [record[primary_key]]
-                    cursor.execute(update_query, update_values)
-                st.success(f"Updated {len(to_update)} rows")
-
-            # Insert new rows
-            if to_insert:
-                for record in to_insert:
-                    # Remove None/NaN values
-                    clean_record = {k: v for k, v in record.items() if pd.notna(v)}
-
-                    # Ensure we have values for all columns
-                    insert_columns = list(clean_record.keys())
-                    insert_query = f"""
-                    INSERT INTO {table_name} ({', '.join(insert_columns)}) 
-                    VALUES ({', '.join(['?' for _ in insert_columns])})
-                    """
-                    cursor.execute(insert_query, list(clean_record.values()))
-                st.success(f"Added {len(to_insert)} new rows")
-
-            # Commit changes
-            conn.commit()
-            st.success("Database updated successfully")
+        # Key-aligned diff, then every change in one batched transaction
+        to_delete, to_update, to_insert = diff_frames(original_df, edited_df, primary_key)
+        if not (to_delete or to_update or to_insert):
+            st.info("No changes to save")
             return True
+        counts = apply_table_changes(table_name, primary_key, to_delete, to_update, to_insert)
 
-        except sqlite3.Error as e:
-            conn.rollback()
-            st.error(f"Database error: {e}")
-            return False
-        except Exception as e:
-            conn.rollback()
-            st.error(f"Unexpected error: {e}")
-            return False
+        if counts['deleted']:
+            st.success(f"Deleted {counts['deleted']} rows")
+        if counts['updated']:
+            st.success(f"Updated {counts['updated']} rows")
+        if counts['inserted']:
+            st.success(f"Added {counts['inserted']} new rows")
 
+        if table_name == 'users':
+            invalidate_user_directory()
+        st.success("Database updated successfully")
+        return True
 
-def reload_users_data():
-    """
-    Reload users data from the database
-    This function helps ensure data consistency across the application
-    """
-    try:
-        with sqlite3.connect(DATABASE_PATH) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT username, role, password FROM users")
-            users_data = cursor.fetchall()
-
-            # Rebuild users dictionary
-            users = {}
-            for username, role, password in users_data:
-                users[username] = {
-                    'role': role,
-                    'password': password
-                }
-
-            return users
+    except sqlite3.Error as e:
+        st.error(f"Database error: {e}")
+        return False
     except Exception as e:
-        st.error(f"Error reloading users: {e}")
-        return {}
+        st.error(f"Unexpected error: {e}")
+        return False
 
 
 def main():
-    # Initialize databases if not exists
-    init_database()
-    init_task_database()
+    started = time.perf_counter()
+    start_rerun('full_rerun')
 
-    init_session_state()
+    # Create or upgrade the schema once per process
+    ensure_schema()
 
-    if not st.session_state.authenticated:
-        login_page()
-    else:
-        main_page()
+    # Serve or write metrics if configured, once per process
+    start_exporters()
+
+    init_session_state()
+    touch_session(st.session_state.session_id)
+
+    start_trace()
+    authenticated = st.session_state.authenticated
+    menu = "Login"
+    profile = None
+    # Reruns ending in st.rerun() (logins, creates, "Load more") leave via an
+    # exception, so they are timed, traced and profiled in the finally block
+    try:
+        if not authenticated:
+            login_page()
+        elif st.session_state.pop('profile_next_rerun', False):
+            with profiled() as profile:
+                main_page()
+        else:
+            main_page()
+    finally:
+        elapsed = time.perf_counter() - started
+        if profile is not None:
+            if profile['profile'] is None:
+                st.session_state.profile_skipped = True
+            else:
+                st.session_state.last_profile = profile['profile']
+                st.session_state.profile_skipped = False
+        if authenticated:
+            menu = st.session_state.get('current_menu', menu)
+            record_render_timing('full_rerun', elapsed)
+            rerun_latencies.record(menu, elapsed)
+        reruns_total.inc(page=menu)
+        rerun_duration.observe(elapsed, page=menu)
+        st.session_state.last_trace = finish_trace()
 
 
 if __name__ == "__main__":
@@ -1,66 +1,83 @@
 import sqlite3
 import hashlib
-from config import DATABASE_PATH
+import threading
+from bisect import bisect_left
+from db_utils import read_connection, write_connection
+from trace_utils import traced
+from metrics_utils import login_attempts
 
 
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
 
 
-def init_database():
-    """Initialize the SQLite database with necessary tables"""
-    with sqlite3.connect(DATABASE_PATH) as conn:
-        cursor = conn.cursor()
+class UserDirectory:
+    """Sorted (username, role) snapshot of the users table; never holds password hashes"""
 
-        # Create users table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            username TEXT PRIMARY KEY,
-            password TEXT NOT NULL,
-            role TEXT NOT NULL
-        )
-        ''')
-
-        # Check if default boss exists
-        cursor.execute("SELECT COUNT(*) FROM users WHERE username = ?", ("Shammi Kapoor",))
-        if cursor.fetchone()[0] == 0:
-            # Add default boss if not exists
-            default_password = hash_password("admin123")
-            cursor.execute('''
-            INSERT INTO users (username, password, role) 
-            VALUES (?, ?, ?)
-            ''', ("Shammi Kapoor", default_password, "boss"))
+    def __init__(self, rows):
+        self._roles = dict(rows)
+        self._names = sorted(self._roles)
+        self._names_by_role = {}
+        for name in self._names:
+            self._names_by_role.setdefault(self._roles[name], []).append(name)
 
-        # Check if database user exists
-        cursor.execute("SELECT COUNT(*) FROM users WHERE username = ?", ("DatabaseAdmin",))
-        if cursor.fetchone()[0] == 0:
-            # Add default database user
-            db_password = hash_password("database123")
-            cursor.execute('''
-            INSERT INTO users (username, password, role) 
-            VALUES (?, ?, ?)
-            ''', ("DatabaseAdmin", db_password, "database"))
+    def __len__(self):
+        return len(self._names)
 
-        conn.commit()
+    def __contains__(self, username):
+        return username in self._roles
 
+    def role_of(self, username):
+        """Role of a user, or None if unknown"""
+        return self._roles.get(username)
 
-def load_users():
-    """Load all users from the database"""
-    with sqlite3.connect(DATABASE_PATH) as conn:
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute("SELECT username, password, role FROM users")
-        users = {row['username']: {
-            'password': row['password'],
-            'role': row['role']
-        } for row in cursor.fetchall()}
-    return users
+    def users(self, role=None):
+        """Sorted usernames, optionally restricted to one role"""
+        if role is None:
+            return list(self._names)
+        return list(self._names_by_role.get(role, []))
+
+    def with_prefix(self, prefix, role=None, limit=None):
+        """Sorted usernames starting with prefix, found by binary search"""
+        names = self._names if role is None else self._names_by_role.get(role, [])
+        start = bisect_left(names, prefix)
+        end = bisect_left(names, prefix + '\U0010ffff', lo=start)
+        if limit is not None:
+            end = min(end, start + limit)
+        return names[start:end]
+
+
+_directory = None
+_directory_lock = threading.Lock()
+
+
+@traced(kind='fetch')
+def get_user_directory():
+    """Return the cached user directory, loading it on first use or after invalidation"""
+    global _directory
+    directory = _directory
+    if directory is None:
+        with _directory_lock:
+            if _directory is None:
+                with read_connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute("SELECT username, role FROM users")
+                    _directory = UserDirectory([(row['username'], row['role']) for row in cursor.fetchall()])
+            directory = _directory
+    return directory
+
+
+def invalidate_user_directory():
+    """Drop the cached directory; call after any change to the users table"""
+    global _directory
+    with _directory_lock:
+        _directory = None
 
 
 def authenticate_user(username, password):
     """Authenticate user credentials"""
     hashed_password = hash_password(password)
-    with sqlite3.connect(DATABASE_PATH) as conn:
+    with read_connection() as conn:
         cursor = conn.cursor()
         cursor.execute('''
         SELECT role FROM users 
@@ -68,13 +85,14 @@ def authenticate_user(username, password):
         ''', (username, hashed_password))
         result = cursor.fetchone()
 
+    login_attempts.inc(result='success' if result else 'failure')
     return (True, result[0]) if result else (False, None)
 
 
 def add_user(username, password, role='member'):
     """Add a new user to the database"""
     try:
-        with sqlite3.connect(DATABASE_PATH) as conn:
+        with write_connection() as conn:
             cursor = conn.cursor()
             # Check if username already exists
             cursor.execute("SELECT COUNT(*) FROM users WHERE username = ?", (username,))
@@ -87,7 +105,8 @@ def add_user(username, password, role='member'):
             INSERT INTO users (username, password, role)
             VALUES (?, ?, ?)
             ''', (username, hashed_pw, role))
-            conn.commit()
+        # Invalidate after the commit so no reader can reload the old list
+        invalidate_user_directory()
         return True
     except sqlite3.IntegrityError:
         return False
@@ -0,0 +1,254 @@
+import gzip
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from config import DATABASE_PATH, BACKUP_DIR, BACKUP_PAGES_PER_STEP, BACKUP_STEP_PAUSE, BACKUP_RETENTION, \
+    RESTORE_PAUSE_TIMEOUT
+from db_utils import pause_database
+from schema_utils import LATEST_VERSION, ensure_schema, reset_schema_check, migrate_database_file
+from cache_utils import clear_query_caches
+from auth_utils import invalidate_user_directory
+from table_stats_utils import table_stats
+
+BACKUP_PREFIX = "backup_"
+BACKUP_SUFFIXES = (".db", ".db.gz")
+
+
+class BackupJob:
+    """
+    Online backup of the live database, run on a background thread
+
+    Pages are copied with the SQLite backup API from a read transaction, so
+    the copy is a consistent snapshot while sessions keep writing, and the
+    progress attributes can be polled from any thread.
+    """
+
+    def __init__(self, database_path, backup_dir, compress=False, pages_per_step=1024, step_pause=0.0):
+        self.database_path = database_path
+        self.compress = compress
+        self.pages_per_step = pages_per_step
+        self.step_pause = step_pause
+
+        name = f"{BACKUP_PREFIX}{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
+        self.path = Path(backup_dir) / (name + ".gz" if compress else name)
+        self.status = 'pending'
+        self.pages_total = 0
+        self.pages_done = 0
+        self.error = None
+        self.started = None
+        self.finished = None
+        self._thread = None
+
+    @property
+    def progress(self):
+        """Fraction of pages copied, from 0.0 to 1.0"""
+        if self.status == 'done':
+            return 1.0
+        return self.pages_done / self.pages_total if self.pages_total else 0.0
+
+    @property
+    def running(self):
+        return self.status in ('pending', 'running', 'compressing')
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sqlite-backup", daemon=True)
+        self._thread.start()
+        return self
+
+    def wait(self, timeout=None):
+        """Block until the backup finishes (mainly for scripts)"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self
+
+    def _on_step(self, status, remaining, total):
+        self.pages_total = total
+        self.pages_done = total - remaining
+        if self.step_pause:
+            # Leave the disk to interactive sessions between steps
+            time.sleep(self.step_pause)
+
+    def _run(self):
+        self.status = 'running'
+        self.started = time.time()
+        partial = self.path.with_name(self.path.name + ".partial")
+        try:
+            uri = Path(self.database_path).resolve().as_uri() + "?mode=ro"
+            source = sqlite3.connect(uri, uri=True)
+            target = sqlite3.connect(partial)
+            try:
+                # Holding a read transaction pins one WAL snapshot, so commits
+                # made during the copy neither tear it nor restart it
+                source.execute("BEGIN")
+                source.execute("SELECT 1 FROM sqlite_master LIMIT 1")
+                source.backup(target, pages=self.pages_per_step, progress=self._on_step)
+                # A self-contained file: opening it later leaves no -wal/-shm behind
+                target.execute("PRAGMA journal_mode=DELETE")
+            finally:
+                source.close()
+                target.close()
+
+            if self.compress:
+                self.status = 'compressing'
+                with open(partial, "rb") as raw, gzip.open(self.path, "wb") as packed:
+                    shutil.copyfileobj(raw, packed, 1024 * 1024)
+                partial.unlink()
+            else:
+                os.replace(partial, self.path)
+
+            self.status = 'done'
+            rotate_backups(self.path.parent, BACKUP_RETENTION)
+        except Exception as e:
+            self.status = 'failed'
+            self.error = e
+            if partial.exists():
+                partial.unlink()
+        finally:
+            self.finished = time.time()
+
+
+def list_backups(backup_dir=BACKUP_DIR):
+    """Backup files in backup_dir, newest first"""
+    backups = [
+        path for path in Path(backup_dir).iterdir()
+        if path.name.startswith(BACKUP_PREFIX) and path.name.endswith(BACKUP_SUFFIXES)
+    ]
+    return sorted(backups, key=lambda path: path.stat().st_mtime, reverse=True)
+
+
+def rotate_backups(backup_dir=BACKUP_DIR, keep=BACKUP_RETENTION):
+    """Delete all but the newest `keep` backups, returning the removed paths"""
+    if keep <= 0:
+        return []
+    removed = list_backups(backup_dir)[keep:]
+    for path in removed:
+        path.unlink()
+    return removed
+
+
+class RestoreError(Exception):
+    """Raised when a backup fails validation or cannot be swapped in"""
+
+
+def validate_backup(path):
+    """
+    Check that path holds an intact database this version of the app can open
+
+    Returns:
+        The backup's schema version (0 for databases predating schema_version)
+    """
+    uri = Path(path).resolve().as_uri() + "?mode=ro"
+    try:
+        conn = sqlite3.connect(uri, uri=True)
+        try:
+            problems = [row[0] for row in conn.execute("PRAGMA integrity_check").fetchall()]
+            if problems != ['ok']:
+                raise RestoreError(f"Integrity check failed: {'; '.join(problems[:5])}")
+            if not conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='tasks'").fetchone():
+                raise RestoreError("Backup has no tasks table")
+            version = 0
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='schema_version'").fetchone():
+                version = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()[0] or 0
+        finally:
+            conn.close()
+    except sqlite3.DatabaseError as e:
+        raise RestoreError(f"Not a readable SQLite database: {e}") from e
+
+    if version > LATEST_VERSION:
+        raise RestoreError(f"Backup schema version {version} is newer than this app's {LATEST_VERSION}")
+    return version
+
+
+def _copy_database(source_path, target_path):
+    source = sqlite3.connect(Path(source_path).resolve().as_uri() + "?mode=ro", uri=True)
+    target = sqlite3.connect(target_path)
+    try:
+        source.backup(target, pages=BACKUP_PAGES_PER_STEP)
+        target.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        source.close()
+        target.close()
+
+
+def restore_backup(backup_path):
+    """
+    Replace the live database with a backup without restarting the app
+
+    The backup is decompressed if needed, validated and copied with the
+    backup API into a temporary file beside the live database while sessions
+    keep working. Older backups are migrated in that copy, so sessions never
+    see the previous schema. Only the final rename runs with the pool
+    paused, after which every cache is dropped.
+
+    Returns:
+        The restored database's schema version before migration
+    """
+    backup_path = Path(backup_path)
+    live = Path(DATABASE_PATH)
+    staged = live.with_name(live.name + ".restore")
+    unpacked = None
+    try:
+        if backup_path.name.endswith(".gz"):
+            unpacked = live.with_name(live.name + ".restore-unpacked")
+            with gzip.open(backup_path, "rb") as packed, open(unpacked, "wb") as raw:
+                shutil.copyfileobj(packed, raw, 1024 * 1024)
+            backup_path = unpacked
+
+        version = validate_backup(backup_path)
+        if staged.exists():
+            staged.unlink()
+        _copy_database(backup_path, staged)
+        migrate_database_file(staged)
+
+        with pause_database(RESTORE_PAUSE_TIMEOUT):
+            # With every connection closed SQLite has checkpointed and removed
+            # the WAL; a leftover one belongs to another process
+            for suffix in ("-wal", "-journal"):
+                sidecar = live.with_name(live.name + suffix)
+                if sidecar.exists() and sidecar.stat().st_size:
+                    raise RestoreError(f"{sidecar.name} is still in use by another process")
+            for suffix in ("-wal", "-shm"):
+                live.with_name(live.name + suffix).unlink(missing_ok=True)
+            os.replace(staged, live)
+    except TimeoutError as e:
+        raise RestoreError(f"Database is busy, try again: {e}") from e
+    finally:
+        for leftover in (staged, unpacked):
+            if leftover is not None:
+                for suffix in ("", "-wal", "-shm", "-journal"):
+                    leftover.with_name(leftover.name + suffix).unlink(missing_ok=True)
+
+    reset_schema_check()
+    ensure_schema()
+    clear_query_caches()
+    invalidate_user_directory()
+    table_stats.invalidate()
+    return version
+
+
+_current_job = None
+_job_lock = threading.Lock()
+
+
+def start_backup(compress=False):
+    """
+    Start a background backup of the live database
+
+    Only one backup runs at a time; while one is in progress this returns
+    that job instead of starting another.
+    """
+    global _current_job
+    with _job_lock:
+        if _current_job is None or not _current_job.running:
+            _current_job = BackupJob(DATABASE_PATH, BACKUP_DIR, compress,
+                                     BACKUP_PAGES_PER_STEP, BACKUP_STEP_PAUSE).start()
+        return _current_job
+
+
+def get_backup_job():
+    """The running or most recently finished backup job, if any"""
+    return _current_job
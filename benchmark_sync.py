@@ -0,0 +1,119 @@
+# benchmark_sync.py
+"""
+Benchmark the Database Management table sync on a scratch messages table.
+
+    python benchmark_sync.py --rows 10000 100000
+
+For each size, fills a scratch database with that many messages, edits 1% of
+the rows, deletes 1% and adds 1%, then times diff_frames and
+apply_table_changes. The previous row-by-row comparison is timed as well for
+sizes up to --legacy-limit, since it grows quadratically.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+
+def legacy_detect_changes(orig_df, edit_df, primary_key):
+    # The comparison sync_database_changes used before diff_frames
+    orig_records = orig_df.to_dict('records')
+    edit_records = edit_df.to_dict('records')
+    to_delete = [
+        record for record in orig_records
+        if record[primary_key] not in edit_df[primary_key].values
+    ]
+    to_update = [
+        record for record in edit_records
+        if record[primary_key] in orig_df[primary_key].values and
+           any(orig_record[primary_key] == record[primary_key] and orig_record != record
+               for orig_record in orig_records)
+    ]
+    to_insert = [
+        record for record in edit_records
+        if record[primary_key] not in orig_df[primary_key].values
+    ]
+    return to_delete, to_update, to_insert
+
+
+def build_frames(count):
+    import pandas as pd
+
+    original = pd.DataFrame({
+        'message_id': range(1, count + 1),
+        'task_id': [i % 1000 + 1 for i in range(count)],
+        'sender': [f"member{i % 50}" for i in range(count)],
+        'message': [f"Message {i}" for i in range(count)],
+        'timestamp': ["2030-01-01 00:00:00"] * count,
+        'message_type': ["user"] * count
+    })
+
+    step = 100
+    edited = original.copy()
+    edited.loc[edited.index[::step], 'message'] = "edited"
+    edited = edited.drop(edited.index[step // 2::step])
+    added = pd.DataFrame({
+        'message_id': [None] * (count // step),
+        'task_id': [1] * (count // step),
+        'sender': ["benchmark"] * (count // step),
+        'message': ["added"] * (count // step),
+        'timestamp': ["2030-01-02 00:00:00"] * (count // step),
+        'message_type': ["user"] * (count // step)
+    })
+    return original, pd.concat([edited, added], ignore_index=True)
+
+
+def run_benchmark(count, legacy_limit):
+    from db_utils import write_connection
+    from sync_utils import diff_frames, apply_table_changes
+
+    original, edited = build_frames(count)
+    with write_connection() as conn:
+        conn.execute("DELETE FROM messages")
+        conn.executemany(
+            "INSERT INTO messages (message_id, task_id, sender, message, timestamp, message_type) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            original.itertuples(index=False, name=None)
+        )
+
+    started = time.perf_counter()
+    to_delete, to_update, to_insert = diff_frames(original, edited, 'message_id')
+    diff_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    apply_table_changes('messages', 'message_id', to_delete, to_update, to_insert)
+    apply_time = time.perf_counter() - started
+
+    print(f"{count} rows: {len(to_delete)} deleted, {len(to_update)} updated, {len(to_insert)} inserted")
+    print(f"  diff_frames:          {diff_time:.3f}s")
+    print(f"  apply_table_changes:  {apply_time:.3f}s")
+
+    if count <= legacy_limit:
+        started = time.perf_counter()
+        legacy_detect_changes(original, edited, 'message_id')
+        legacy_time = time.perf_counter() - started
+        print(f"  previous comparison:  {legacy_time:.3f}s ({legacy_time / diff_time:.0f}x slower)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000], help="table sizes to benchmark")
+    parser.add_argument("--legacy-limit", type=int, default=10000,
+                        help="largest size to also time the previous comparison on")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        # Set before the app modules are imported so config picks it up
+        os.environ["TASK_DB_PATH"] = os.path.join(scratch, "benchmark.db")
+        from schema_utils import ensure_schema
+        ensure_schema()
+        for count in args.rows:
+            run_benchmark(count, args.legacy_limit)
+        from db_utils import get_pool
+        get_pool().close_all()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+import threading
+from collections import OrderedDict
+from functools import wraps
+from config import QUERY_CACHE_SIZE
+from db_utils import get_data_version
+
+_registry = {}
+
+
+class QueryCache:
+    """Bounded LRU of query results, each tagged with the data version it was read at"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        """Return (True, result) for a fresh entry, (False, None) otherwise"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, version, result):
+        with self._lock:
+            self._entries[key] = (version, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+
+def _freeze(value):
+    # Lists (e.g. task id lists) and dicts (e.g. column filters) are not hashable
+    if isinstance(value, dict):
+        return tuple(sorted(value.items()))
+    return tuple(value) if isinstance(value, list) else value
+
+
+def _make_key(args, kwargs):
+    return tuple(_freeze(arg) for arg in args), tuple(sorted((k, _freeze(v)) for k, v in kwargs.items()))
+
+
+def cached_query(maxsize=None):
+    """
+    Cache a read function's results until the database changes
+
+    Entries are keyed on the call arguments and stamped with the pool's data
+    version, so any commit (ours or another connection's) invalidates them.
+    Cached results are shared between callers and must be treated as read-only.
+    """
+    def decorator(func):
+        cache = QueryCache(maxsize or QUERY_CACHE_SIZE)
+        _registry[func.__qualname__] = cache
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = _make_key(args, kwargs)
+            version = get_data_version()
+            found, result = cache.get(key, version)
+            if found:
+                return result
+            result = func(*args, **kwargs)
+            cache.put(key, version, result)
+            return result
+
+        wrapper.cache = cache
+        return wrapper
+    return decorator
+
+
+def get_cache_stats():
+    """Hit/miss counters and entry counts per cached function"""
+    return {name: cache.stats() for name, cache in _registry.items()}
+
+
+def clear_query_caches():
+    """Drop every cached result"""
+    for cache in _registry.values():
+        cache.clear()
@@ -0,0 +1,78 @@
+# check_import_parsing.py
+"""
+Regression check for bulk import error reporting.
+
+Imports small CSV and JSON Lines files with broken rows into a scratch
+database and exits non-zero if any bad row is not reported with the
+expected error, or if a good row next to it is not imported.
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+
+JSONL_ROWS = "\n".join([
+    '{"title": "First", "description": "ok", "assigned_to": "member", "due_date": "2030-01-01"}',
+    '{"title": "Broken", "description": "missing brace", "assigned_to": "member"',
+    '["not", "an", "object"]',
+    '',
+    '{"title": "Last", "description": "ok", "assigned_to": "member", "due_date": "2030-01-02"}',
+])
+
+# (import row number, expected text in its error)
+JSONL_EXPECTED = [(2, "line 2: invalid JSON"), (3, "line 3: expected a JSON object, got list")]
+
+CSV_ROWS = "title,description,assigned_to,due_date\nFirst,ok,member,2030-01-01\n,no title,member,2030-01-01\n"
+
+CSV_EXPECTED = [(2, "title")]
+
+
+def check(name, fmt, text, expected_errors, expected_created):
+    from import_utils import read_task_rows
+    from task_utils import create_tasks_bulk
+
+    result = create_tasks_bulk(read_task_rows(io.StringIO(text), fmt), default_assigned_by="boss")
+    created, errors = result['created'], result['errors']
+    problems = []
+    if len(created) != expected_created:
+        problems.append(f"created {len(created)} tasks, expected {expected_created}")
+    reported = dict(errors)
+    for row, expected in expected_errors:
+        if expected not in reported.get(row, ""):
+            problems.append(f"row {row}: expected an error containing {expected!r}, got {reported.get(row)!r}")
+    if len(errors) != len(expected_errors):
+        problems.append(f"{len(errors)} errors reported, expected {len(expected_errors)}: {errors}")
+
+    print(f"{name}: {'FAIL' if problems else 'ok'}")
+    for problem in problems:
+        print(f"    {problem}")
+    return not problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.parse_args()
+
+    scratch = tempfile.TemporaryDirectory()
+    os.environ["TASK_DB_PATH"] = os.path.join(scratch.name, "import.db")
+
+    # Imported late so config picks up TASK_DB_PATH
+    from schema_utils import ensure_schema
+    from auth_utils import add_user
+    from db_utils import get_pool
+
+    ensure_schema()
+    add_user("member", "secret")
+
+    results = [
+        check("JSON Lines with broken lines", "jsonl", JSONL_ROWS, JSONL_EXPECTED, 2),
+        check("CSV with a missing title", "csv", CSV_ROWS, CSV_EXPECTED, 1),
+    ]
+    get_pool().close_all()
+    scratch.cleanup()
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+# check_query_plans.py
+"""
+Regression check for the hot-path query plans.
+
+Runs EXPLAIN QUERY PLAN for each query in HOT_QUERIES and exits non-zero if
+any of them falls back to a full table scan. By default it checks a scratch
+database built from the migrations; pass --database to check a real file.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+
+def find_table_scans(conn, query, params):
+    """Return the plan lines of a query that scan a whole table"""
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+    # "SCAN t" is a full scan; "SEARCH t USING ...", temp b-trees and scans of
+    # already-filtered subquery results ("SCAN (subquery-N)") are fine
+    return [row[3] for row in plan if row[3].startswith("SCAN ") and not row[3].startswith("SCAN (")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database", help="database file to check (default: scratch database)")
+    args = parser.parse_args()
+
+    scratch = None
+    if args.database:
+        os.environ["TASK_DB_PATH"] = args.database
+    else:
+        scratch = tempfile.TemporaryDirectory()
+        os.environ["TASK_DB_PATH"] = os.path.join(scratch.name, "plans.db")
+
+    # Imported late so config picks up TASK_DB_PATH
+    from db_utils import read_connection
+    from schema_utils import ensure_schema
+    from task_utils import MEMBER_TASKS_QUERY, USER_TASK_STATS_QUERY, TASK_MESSAGES_QUERY, TASKS_MESSAGES_QUERY, \
+        BOSS_TASKS_PAGE_QUERY, MEMBER_TASKS_PAGE_QUERY, KEYSET_CONDITION
+
+    hot_queries = {
+        "get_user_tasks (member)": (MEMBER_TASKS_QUERY, ("member", "member")),
+        "get_user_tasks_page (boss)": (
+            BOSS_TASKS_PAGE_QUERY.format(keyset=KEYSET_CONDITION), ("2024-01-01", 1, 25)),
+        "get_user_tasks_page (member)": (
+            MEMBER_TASKS_PAGE_QUERY.format(keyset=KEYSET_CONDITION), ("2024-01-01", 1, "member", "member", 25)),
+        "get_user_task_stats": (USER_TASK_STATS_QUERY, ("member",)),
+        "get_task_messages": (TASK_MESSAGES_QUERY.format(filters="", order="ASC", limit=""), (1,)),
+        "get_task_messages (tail window)": (
+            TASK_MESSAGES_QUERY.format(filters=" AND message_id < ?", order="DESC", limit=" LIMIT ?"), (1, 100, 50)),
+        "get_task_messages (since cursor)": (
+            TASK_MESSAGES_QUERY.format(filters=" AND message_id > ?", order="ASC", limit=""), (1, 100)),
+        "get_messages_for_tasks": (TASKS_MESSAGES_QUERY.format(placeholders="?, ?"), (1, 2, 50, 50)),
+    }
+
+    ensure_schema()
+    failures = 0
+    with read_connection() as conn:
+        for name, (query, params) in hot_queries.items():
+            scans = find_table_scans(conn, query, params)
+            if scans:
+                failures += 1
+                print(f"FAIL {name}: {'; '.join(scans)}")
+            else:
+                print(f"ok   {name}")
+
+    if scratch is not None:
+        from db_utils import get_pool
+        get_pool().close_all()
+        scratch.cleanup()
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,3 @@
-# config.py
 import os
 import sqlite3
 from pathlib import Path
@@ -7,5 +6,76 @@ from pathlib import Path
 BASE_DIR = Path("data")
 BASE_DIR.mkdir(exist_ok=True)
 
-# SQLite database path
-DATABASE_PATH = BASE_DIR / "team_task_manager.db"
\ No newline at end of file
+# SQLite database path (override with TASK_DB_PATH, e.g. for scratch databases)
+DATABASE_PATH = Path(os.environ.get("TASK_DB_PATH", BASE_DIR / "team_task_manager.db"))
+
+# Connection pool settings
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 4))
+DB_TIMEOUT = float(os.environ.get("DB_TIMEOUT", 30.0))
+
+# Number of task cards loaded per page on the Tasks dashboard
+TASK_PAGE_SIZE = int(os.environ.get("TASK_PAGE_SIZE", 25))
+
+# Number of rows per page in the Database Management table browser
+TABLE_PAGE_SIZE = int(os.environ.get("TABLE_PAGE_SIZE", 100))
+
+# Number of most recent chat messages shown per task card
+CHAT_WINDOW_SIZE = int(os.environ.get("CHAT_WINDOW_SIZE", 50))
+
+# Maximum cached results per cached query function
+QUERY_CACHE_SIZE = int(os.environ.get("QUERY_CACHE_SIZE", 256))
+
+# Group-commit write queue: one writer thread batches up to WRITE_BATCH_SIZE
+# writes, optionally waiting up to WRITE_MAX_DELAY seconds for a batch to fill
+# (0 batches whatever queued up during the previous commit, adding no latency)
+WRITE_QUEUE_ENABLED = os.environ.get("WRITE_QUEUE_ENABLED", "1") == "1"
+WRITE_BATCH_SIZE = int(os.environ.get("WRITE_BATCH_SIZE", 64))
+WRITE_MAX_DELAY = float(os.environ.get("WRITE_MAX_DELAY", 0.0))
+
+# Journal and durability settings; WAL lets readers run alongside the writer
+DB_JOURNAL_MODE = os.environ.get("DB_JOURNAL_MODE", "WAL")
+DB_SYNCHRONOUS = os.environ.get("DB_SYNCHRONOUS", "NORMAL")
+
+# Writers retry "database is locked" this many times, backing off exponentially
+DB_WRITE_RETRIES = int(os.environ.get("DB_WRITE_RETRIES", 3))
+DB_RETRY_BACKOFF = float(os.environ.get("DB_RETRY_BACKOFF", 0.05))
+
+# SQL console limits: rows and approximate bytes shown per query, and seconds
+# before a console query (or a full CSV export) is interrupted
+SQL_CONSOLE_MAX_ROWS = int(os.environ.get("SQL_CONSOLE_MAX_ROWS", 1000))
+SQL_CONSOLE_MAX_BYTES = int(os.environ.get("SQL_CONSOLE_MAX_BYTES", 5_000_000))
+SQL_CONSOLE_TIMEOUT = float(os.environ.get("SQL_CONSOLE_TIMEOUT", 10.0))
+SQL_EXPORT_TIMEOUT = float(os.environ.get("SQL_EXPORT_TIMEOUT", 300.0))
+
+# Online backups: written to BACKUP_DIR as backup_*.db(.gz), copied
+# BACKUP_PAGES_PER_STEP pages at a time with an optional pause between steps,
+# keeping the newest BACKUP_RETENTION files (0 keeps all)
+BACKUP_DIR = Path(os.environ.get("BACKUP_DIR", BASE_DIR))
+BACKUP_PAGES_PER_STEP = int(os.environ.get("BACKUP_PAGES_PER_STEP", 1024))
+BACKUP_STEP_PAUSE = float(os.environ.get("BACKUP_STEP_PAUSE", 0.0))
+BACKUP_RETENTION = int(os.environ.get("BACKUP_RETENTION", 10))
+
+# Seconds a restore waits for in-flight reads and writes before giving up
+RESTORE_PAUSE_TIMEOUT = float(os.environ.get("RESTORE_PAUSE_TIMEOUT", 30.0))
+
+# Record every statement run through the connection pool (normalized SQL,
+# call site, duration, rows) in a ring buffer of SQL_PROFILE_BUFFER_SIZE entries
+SQL_PROFILING = os.environ.get("SQL_PROFILING", "1") == "1"
+SQL_PROFILE_BUFFER_SIZE = int(os.environ.get("SQL_PROFILE_BUFFER_SIZE", 2000))
+
+# Rerun durations kept per menu item for the latency percentiles
+RERUN_LATENCY_SAMPLES = int(os.environ.get("RERUN_LATENCY_SAMPLES", 500))
+
+# Prometheus-style metrics: METRICS_PORT serves /metrics on localhost (0 turns
+# the endpoint off) and METRICS_FILE, if set, is rewritten every
+# METRICS_FILE_INTERVAL seconds for a textfile collector
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+METRICS_PORT = int(os.environ.get("METRICS_PORT", 0))
+METRICS_FILE = os.environ.get("METRICS_FILE", "")
+METRICS_FILE_INTERVAL = float(os.environ.get("METRICS_FILE_INTERVAL", 15.0))
+
+# Table statistics on the Database Info tab are recollected in the background
+# once older than TABLE_STATS_MAX_AGE seconds; ANALYZE samples about
+# ANALYZE_ROW_LIMIT rows per index (0 reads every row)
+TABLE_STATS_MAX_AGE = float(os.environ.get("TABLE_STATS_MAX_AGE", 300.0))
+ANALYZE_ROW_LIMIT = int(os.environ.get("ANALYZE_ROW_LIMIT", 1000))
@@ -0,0 +1,130 @@
+import csv
+import time
+from contextlib import contextmanager
+from db_utils import read_connection, write_connection, begin_immediate
+
+# SQLite VM instructions between deadline checks
+PROGRESS_INTERVAL = 1000
+
+# Rows pulled from the cursor per fetchmany call
+FETCH_SIZE = 500
+
+
+class QueryTimeout(Exception):
+    """Raised when a console query runs past its time limit"""
+
+
+@contextmanager
+def deadline(conn, timeout):
+    """Interrupt any statement on conn that is still running after timeout seconds"""
+    expires = time.monotonic() + timeout
+    conn.set_progress_handler(lambda: int(time.monotonic() > expires), PROGRESS_INTERVAL)
+    try:
+        yield
+    except Exception as e:
+        if "interrupted" in str(e) and time.monotonic() > expires:
+            raise QueryTimeout(f"Query exceeded the {timeout:g}s time limit") from e
+        raise
+    finally:
+        conn.set_progress_handler(None, PROGRESS_INTERVAL)
+
+
+def _row_size(row):
+    # Rough in-memory footprint of a result row, for the byte cap
+    return sum(len(value) if isinstance(value, (str, bytes)) else 8 for value in row)
+
+
+def explain_query_plan(query):
+    """Lines of EXPLAIN QUERY PLAN output for query, indented by nesting"""
+    with read_connection() as conn:
+        rows = conn.execute(f"EXPLAIN QUERY PLAN {query}").fetchall()
+    depth = {0: -1}
+    lines = []
+    for row in rows:
+        depth[row['id']] = depth.get(row['parent'], -1) + 1
+        lines.append("  " * depth[row['id']] + row['detail'])
+    return lines
+
+
+def run_select(query, max_rows, max_bytes, timeout):
+    """
+    Run a read-only query, keeping at most max_rows rows or max_bytes of data
+
+    Args:
+        query: a single SELECT statement
+        max_rows: row cap for the returned result
+        max_bytes: approximate size cap for the returned result
+        timeout: seconds before the query is interrupted
+
+    Returns:
+        Dict with 'columns', 'rows', 'truncated' (None, 'rows' or 'bytes')
+        and 'elapsed' seconds
+    """
+    started = time.perf_counter()
+    rows = []
+    size = 0
+    truncated = None
+    with read_connection() as conn:
+        with deadline(conn, timeout):
+            cursor = conn.execute(query)
+            columns = [description[0] for description in cursor.description or ()]
+            while truncated is None:
+                batch = cursor.fetchmany(FETCH_SIZE)
+                if not batch:
+                    break
+                for row in batch:
+                    if len(rows) >= max_rows:
+                        truncated = 'rows'
+                        break
+                    size += _row_size(row)
+                    if size > max_bytes:
+                        truncated = 'bytes'
+                        break
+                    rows.append(tuple(row))
+    return {
+        'columns': columns,
+        'rows': rows,
+        'truncated': truncated,
+        'elapsed': time.perf_counter() - started
+    }
+
+
+def run_statement(query, timeout):
+    """
+    Run a single INSERT, UPDATE or DELETE statement on the writer connection
+
+    Returns:
+        Dict with 'rowcount' and 'elapsed' seconds
+    """
+    started = time.perf_counter()
+    with write_connection() as conn:
+        begin_immediate(conn)
+        with deadline(conn, timeout):
+            rowcount = conn.execute(query).rowcount
+    return {'rowcount': rowcount, 'elapsed': time.perf_counter() - started}
+
+
+def export_csv(query, path, timeout):
+    """
+    Write the full result of a read-only query to a CSV file at path
+
+    Rows are streamed with fetchmany, so memory use stays flat however large
+    the result is.
+
+    Returns:
+        Number of rows written
+    """
+    count = 0
+    with read_connection() as conn, open(path, "w", newline="", encoding="utf-8") as out:
+        writer = csv.writer(out)
+        with deadline(conn, timeout):
+            cursor = conn.execute(query)
+            writer.writerow([description[0] for description in cursor.description or ()])
+            while True:
+                batch = cursor.fetchmany(FETCH_SIZE)
+                if not batch:
+                    break
+                writer.writerows(batch)
+                count += len(batch)
+    return count
+
@@ -0,0 +1,357 @@
+import sqlite3
+import threading
+import queue
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from config import DATABASE_PATH, DB_POOL_SIZE, DB_TIMEOUT, DB_JOURNAL_MODE, DB_SYNCHRONOUS, \
+    DB_WRITE_RETRIES, DB_RETRY_BACKOFF, SQL_PROFILING
+from instrument_utils import InstrumentedConnection
+
+
+def is_busy_error(error):
+    """True for the OperationalErrors SQLite raises when another connection holds the lock"""
+    message = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and ("locked" in message or "busy" in message)
+
+
+class ConnectionPool:
+    """
+    Process-wide pool of read-only SQLite connections plus one dedicated writer
+
+    The writer puts the database in WAL mode, so readers never block it. Each
+    reader() block runs in its own read transaction and sees one consistent
+    snapshot of the database.
+    """
+
+    def __init__(self, database_path, pool_size=4, timeout=30.0, journal_mode="WAL",
+                 synchronous="NORMAL", write_retries=3, retry_backoff=0.05, profile=False):
+        self.database_path = database_path
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.write_retries = write_retries
+        self.retry_backoff = retry_backoff
+        # Instrumented connections log every statement to instrument_utils.query_log
+        self.factory = InstrumentedConnection if profile else sqlite3.Connection
+
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._create_lock = threading.Lock()
+        self._writer = None
+        self._writer_lock = threading.RLock()
+        self._local = threading.local()
+
+        # Readers currently lent out, and a gate that holds back new ones while
+        # paused() swaps the database file underneath the pool
+        self._borrowed = 0
+        self._paused = False
+        self._gate = threading.Condition()
+
+        # Bumped on every writer commit; the probe connection's data_version
+        # additionally catches commits made outside this pool
+        self._generation = 0
+        self._probe = None
+        self._probe_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'opened': 0,
+            'reused': 0,
+            'wait_time': 0.0,
+            'reads': 0,
+            'writes': 0,
+            'busy_retries': 0,
+            'lock_wait_time': 0.0
+        }
+
+    def _connect(self, read_only=False, factory=None):
+        factory = factory or self.factory
+        if read_only:
+            uri = Path(self.database_path).resolve().as_uri() + "?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, timeout=self.timeout, check_same_thread=False,
+                                   factory=factory)
+        else:
+            conn = sqlite3.connect(self.database_path, timeout=self.timeout, check_same_thread=False,
+                                   factory=factory)
+            conn.execute(f"PRAGMA journal_mode={self.journal_mode}")
+            conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.row_factory = sqlite3.Row
+        self._bump('opened')
+        return conn
+
+    def _ensure_database(self):
+        # Read-only connections cannot create the file or switch it to WAL
+        if self._writer is None:
+            with self._writer_lock:
+                if self._writer is None:
+                    self._writer = self._connect()
+
+    def _bump(self, key, amount=1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def _borrow(self):
+        # Count the caller as a reader once the pool is open and not paused.
+        # The writer is opened first, with no other pool lock held: paused()
+        # holds the writer lock while it waits for borrowers to drain.
+        while True:
+            self._ensure_database()
+            with self._gate:
+                while self._paused:
+                    self._gate.wait()
+                # A pause in between closed the writer; open it again first
+                if self._writer is not None:
+                    self._borrowed += 1
+                    return
+
+    def _acquire_reader(self):
+        self._borrow()
+        try:
+            return self._checkout_reader()
+        except Exception:
+            self._release_reader(None)
+            raise
+
+    def _release_reader(self, conn):
+        if conn is not None:
+            self._idle.put(conn)
+        with self._gate:
+            self._borrowed -= 1
+            self._gate.notify_all()
+
+    def _checkout_reader(self):
+        try:
+            conn = self._idle.get_nowait()
+            self._bump('reused')
+            return conn
+        except queue.Empty:
+            pass
+
+        with self._create_lock:
+            if self._created < self.pool_size:
+                self._created += 1
+                return self._connect(read_only=True)
+
+        # Pool exhausted, wait for another thread to hand a connection back
+        started = time.perf_counter()
+        conn = self._idle.get()
+        self._bump('wait_time', time.perf_counter() - started)
+        self._bump('reused')
+        return conn
+
+    @contextmanager
+    def reader(self):
+        """Borrow a read-only snapshot connection; nested use on the same thread shares it"""
+        conn = getattr(self._local, 'reader', None)
+        if conn is not None:
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn = self._acquire_reader()
+        self._local.reader = conn
+        self._local.depth = 1
+        self._bump('reads')
+        try:
+            # Deferred read transaction: every statement in the block sees one snapshot
+            conn.execute("BEGIN")
+            yield conn
+        finally:
+            self._local.reader = None
+            self._local.depth = 0
+            if conn.in_transaction:
+                conn.rollback()
+            self._release_reader(conn)
+
+    @contextmanager
+    def writer(self):
+        """Hold the writer connection; commits on success, rolls back on error"""
+        started = time.perf_counter()
+        with self._writer_lock:
+            self._bump('wait_time', time.perf_counter() - started)
+            if self._writer is None:
+                self._writer = self._connect()
+            else:
+                self._bump('reused')
+
+            depth = getattr(self._local, 'write_depth', 0)
+            self._local.write_depth = depth + 1
+            self._bump('writes')
+            try:
+                yield self._writer
+                if depth == 0:
+                    self._writer.commit()
+                    self._generation += 1
+            except Exception:
+                if depth == 0:
+                    self._writer.rollback()
+                raise
+            finally:
+                self._local.write_depth = depth
+
+    def begin_immediate(self, conn):
+        """Start a write transaction on conn, recording how long the lock took"""
+        started = time.perf_counter()
+        conn.execute("BEGIN IMMEDIATE")
+        self._bump('lock_wait_time', time.perf_counter() - started)
+
+    def retry_busy(self, func):
+        """
+        Call func(), retrying with exponential backoff while the database is locked
+
+        The busy timeout already makes each attempt wait up to `timeout` seconds;
+        retries cover writers that still lose the race (e.g. after a checkpoint).
+        """
+        for attempt in range(self.write_retries + 1):
+            started = time.perf_counter()
+            try:
+                return func()
+            except sqlite3.OperationalError as e:
+                if not is_busy_error(e) or attempt == self.write_retries:
+                    raise
+                self._bump('busy_retries')
+                time.sleep(self.retry_backoff * 2 ** attempt)
+                self._bump('lock_wait_time', time.perf_counter() - started)
+
+    def in_write_transaction(self):
+        """True if the calling thread currently holds the writer connection"""
+        return getattr(self._local, 'write_depth', 0) > 0
+
+    def data_version(self):
+        """Token that changes whenever any connection commits to the database"""
+        # Borrowing like a reader keeps the probe away from a paused pool
+        self._borrow()
+        try:
+            with self._probe_lock:
+                if self._probe is None:
+                    # Not instrumented: every cached read polls it, which would
+                    # swamp the query log
+                    self._probe = self._connect(read_only=True, factory=sqlite3.Connection)
+                external = self._probe.execute("PRAGMA data_version").fetchone()[0]
+        finally:
+            self._release_reader(None)
+        return self._generation, external
+
+    def stats(self):
+        """Return a snapshot of the pool counters"""
+        with self._stats_lock:
+            snapshot = dict(self._stats)
+        snapshot['pool_size'] = self.pool_size
+        snapshot['idle'] = self._idle.qsize()
+        return snapshot
+
+    @contextmanager
+    def paused(self, timeout=30.0):
+        """
+        Hold off all database access, with every pooled connection closed
+
+        Takes the writer (so queued and direct writes wait), stops lending
+        readers and waits up to timeout seconds for borrowed ones to come
+        back. Inside the block no connection to the database file is open, so
+        the file can be replaced; connections reopen lazily afterwards.
+        Raises TimeoutError if the pool could not be drained in time.
+        """
+        if self.in_write_transaction():
+            raise RuntimeError("Cannot pause the pool from inside a write transaction")
+        if not self._writer_lock.acquire(timeout=timeout):
+            raise TimeoutError("Timed out waiting for the writer connection")
+        try:
+            deadline = time.monotonic() + timeout
+            with self._gate:
+                self._paused = True
+                while self._borrowed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f"{self._borrowed} read connections still in use")
+                    self._gate.wait(remaining)
+            try:
+                self.close_all()
+                yield
+            finally:
+                self.close_all()
+        finally:
+            with self._gate:
+                self._paused = False
+                self._gate.notify_all()
+            self._writer_lock.release()
+
+    def close_all(self):
+        """Close every idle reader and the writer connection"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._create_lock:
+            self._created = 0
+        with self._probe_lock:
+            if self._probe is not None:
+                self._probe.close()
+                self._probe = None
+        # The writer goes last: only a read-write connection closing last
+        # checkpoints and removes the WAL file
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            self._generation += 1
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide connection pool, creating it on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DATABASE_PATH, DB_POOL_SIZE, DB_TIMEOUT, DB_JOURNAL_MODE,
+                                       DB_SYNCHRONOUS, DB_WRITE_RETRIES, DB_RETRY_BACKOFF, SQL_PROFILING)
+    return _pool
+
+
+def read_connection():
+    """Context manager yielding a pooled read connection"""
+    return get_pool().reader()
+
+
+def write_connection():
+    """Context manager yielding the shared writer connection"""
+    return get_pool().writer()
+
+
+def begin_immediate(conn):
+    """Start a timed BEGIN IMMEDIATE on the writer connection"""
+    get_pool().begin_immediate(conn)
+
+
+def retry_busy(func):
+    """Call func(), retrying while the database is locked by another connection"""
+    return get_pool().retry_busy(func)
+
+
+def in_write_transaction():
+    """True if the calling thread is inside write_connection()"""
+    return get_pool().in_write_transaction()
+
+
+def get_data_version():
+    """Token that changes whenever the database content may have changed"""
+    return get_pool().data_version()
+
+
+def pause_database(timeout=30.0):
+    """Context manager closing every pooled connection and holding off new ones"""
+    return get_pool().paused(timeout)
+
+
+def get_pool_stats():
+    """Connection counters: opened, reused, wait_time, reads, writes, busy_retries, lock_wait_time"""
+    return get_pool().stats()
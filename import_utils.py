@@ -0,0 +1,74 @@
+import csv
+import io
+import json
+from task_utils import create_tasks_bulk
+
+IMPORT_FORMATS = ('csv', 'json', 'jsonl')
+
+
+def detect_format(filename):
+    """Guess the import format from a file name"""
+    extension = filename.rsplit('.', 1)[-1].lower()
+    if extension not in IMPORT_FORMATS:
+        raise ValueError(f"Unsupported file type '.{extension}', expected one of {', '.join(IMPORT_FORMATS)}")
+    return extension
+
+
+def read_task_rows(stream, fmt):
+    """
+    Yield task dicts from a text stream
+
+    CSV files need a header row (title, description, assigned_to, due_date and
+    optionally assigned_by, status); multiple assignees are comma-separated in
+    one quoted cell. JSON Lines files are streamed one object per line; plain
+    JSON files must hold an array of objects and are loaded in one go.
+    Unparseable CSV raises ValueError; an unparseable JSON Lines line is
+    yielded as a ValueError, which create_tasks_bulk reports as a row error.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        while True:
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                raise ValueError(f"CSV parse error after line {reader.line_num}: {e}") from e
+            yield row
+    elif fmt == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if line:
+                yield _parse_json_row(line, line_number)
+    elif fmt == 'json':
+        data = json.load(stream)
+        if not isinstance(data, list):
+            raise ValueError("JSON import must be an array of task objects")
+        yield from data
+    else:
+        raise ValueError(f"Unknown import format '{fmt}'")
+
+
+def _parse_json_row(line, line_number):
+    # Malformed lines are passed on as the ValueError to report for that row,
+    # so one bad line neither aborts the import nor reads as missing fields
+    try:
+        row = json.loads(line)
+    except json.JSONDecodeError as e:
+        return ValueError(f"line {line_number}: invalid JSON: {e}")
+    if not isinstance(row, dict):
+        return ValueError(f"line {line_number}: expected a JSON object, got {type(row).__name__}")
+    return row
+
+
+def import_tasks(stream, fmt, default_assigned_by, chunk_size=500, progress=None):
+    """Stream a CSV/JSON task file into create_tasks_bulk"""
+    if isinstance(stream, (io.BufferedIOBase, io.RawIOBase)) or hasattr(stream, 'getbuffer'):
+        # Uploaded files and binary handles: decode lazily instead of reading it all
+        stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    return create_tasks_bulk(
+        read_task_rows(stream, fmt),
+        default_assigned_by=default_assigned_by,
+        chunk_size=chunk_size,
+        progress=progress
+    )
@@ -0,0 +1,213 @@
+import itertools
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from config import SQL_PROFILE_BUFFER_SIZE
+from metrics_utils import query_duration
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_PARAMETER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(sql):
+    """Collapse whitespace and replace literals and IN/VALUES lists so similar statements group together"""
+    sql = _STRING_LITERAL.sub("?", sql)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    sql = _PARAMETER_LIST.sub("(...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+@lru_cache(maxsize=1024)
+def statement_type(sql):
+    """Leading keyword of a statement (SELECT, INSERT, ...), for metric labels"""
+    words = sql.split(None, 1)
+    return words[0].upper() if words else ""
+
+
+class QueryRecord:
+    """One executed statement; rows and duration grow as its results are fetched"""
+
+    __slots__ = ('sql', 'site', 'started', 'duration', 'rows', 'rerun')
+
+    def __init__(self, sql, site, started, duration, rows, rerun):
+        self.sql = sql
+        self.site = site
+        self.started = started
+        self.duration = duration
+        self.rows = rows
+        self.rerun = rerun
+
+
+class QueryLog:
+    """Ring buffer of the most recent statements plus the reruns they ran in"""
+
+    def __init__(self, maxlen=2000):
+        self._records = deque(maxlen=maxlen)
+        self._reruns = deque(maxlen=100)
+        self._lock = threading.Lock()
+        self._rerun_ids = itertools.count(1)
+        self._local = threading.local()
+
+    def add(self, record):
+        with self._lock:
+            self._records.append(record)
+
+    def records(self):
+        with self._lock:
+            return list(self._records)
+
+    def start_rerun(self, kind):
+        """Tag statements run by the calling thread from now on with a new rerun id"""
+        rerun = (next(self._rerun_ids), kind, time.time())
+        self._local.rerun = rerun[0]
+        with self._lock:
+            self._reruns.append(rerun)
+        return rerun[0]
+
+    def current_rerun(self):
+        return getattr(self._local, 'rerun', None)
+
+    def reruns(self):
+        with self._lock:
+            return list(self._reruns)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+            self._reruns.clear()
+
+
+query_log = QueryLog(SQL_PROFILE_BUFFER_SIZE)
+
+# Frames from this module are skipped when looking for a statement's call site
+_INTERNAL_FILES = {__file__}
+
+
+def _call_site():
+    frame = sys._getframe(2)
+    while frame is not None and frame.f_code.co_filename in _INTERNAL_FILES:
+        frame = frame.f_back
+    if frame is None:
+        return "?"
+    return f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno} {frame.f_code.co_name}"
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that logs each statement's SQL, call site, time and row count"""
+
+    _record = None
+
+    def _log(self, sql, started, rows):
+        duration = time.perf_counter() - started
+        self._record = QueryRecord(normalize_sql(sql), _call_site(), started,
+                                   duration, rows, query_log.current_rerun())
+        query_log.add(self._record)
+        query_duration.observe(duration, statement=statement_type(sql))
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._log(sql, started, max(self.rowcount, 0))
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._log(sql, started, max(self.rowcount, 0))
+
+    def _fetched(self, started, count):
+        if self._record is not None:
+            self._record.duration += time.perf_counter() - started
+            self._record.rows += count
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(started, row is not None)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(started, len(rows))
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        row = super().__next__()
+        self._fetched(started, 1)
+        return row
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose cursors (including execute() shortcuts) are instrumented"""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def start_rerun(kind):
+    """Mark the start of a script rerun ('full_rerun' or 'fragment') on this thread"""
+    return query_log.start_rerun(kind)
+
+
+def summarize_queries(records=None):
+    """
+    Aggregate logged statements by normalized SQL
+
+    Returns:
+        List of dicts with sql, count, total, avg, max, rows and the call
+        sites seen, in no particular order
+    """
+    summary = {}
+    for record in query_log.records() if records is None else records:
+        entry = summary.get(record.sql)
+        if entry is None:
+            entry = summary[record.sql] = {
+                'sql': record.sql, 'count': 0, 'total': 0.0, 'max': 0.0, 'rows': 0, 'sites': set()
+            }
+        entry['count'] += 1
+        entry['total'] += record.duration
+        entry['max'] = max(entry['max'], record.duration)
+        entry['rows'] += record.rows
+        entry['sites'].add(record.site)
+    for entry in summary.values():
+        entry['avg'] = entry['total'] / entry['count']
+    return list(summary.values())
+
+
+def rerun_query_counts():
+    """Statement count and total SQL time of each recent rerun, newest first"""
+    totals = {}
+    for record in query_log.records():
+        if record.rerun is not None:
+            count, elapsed = totals.get(record.rerun, (0, 0.0))
+            totals[record.rerun] = (count + 1, elapsed + record.duration)
+    return [
+        {'rerun': rerun, 'kind': kind, 'at': at,
+         'queries': totals.get(rerun, (0, 0.0))[0], 'sql_time': totals.get(rerun, (0, 0.0))[1]}
+        for rerun, kind, at in reversed(query_log.reruns())
+    ]
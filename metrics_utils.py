@@ -0,0 +1,284 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from config import DATABASE_PATH, METRICS_ENABLED, METRICS_PORT, METRICS_FILE, METRICS_FILE_INTERVAL
+
+# Seconds; suited to both single statements and whole reruns
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# A session counts as active if it reran within this many seconds
+SESSION_ACTIVE_WINDOW = 300
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """
+    Base for registry metrics; values are kept per tuple of label values
+
+    A metric given a callback is instead read from it at exposition time; the
+    callback returns a number, or a dict of label value tuples to numbers.
+    """
+
+    kind = None
+
+    def __init__(self, name, help_text, labels=(), enabled=True, callback=None):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.enabled = enabled
+        self.callback = callback
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        # Hot path: most metrics here carry a single label
+        if len(self.labels) == 1:
+            return (labels.get(self.labels[0], ""),)
+        return tuple([labels.get(name, "") for name in self.labels])
+
+    def _snapshot(self):
+        if self.callback is None:
+            with self._lock:
+                return dict(self._values)
+        try:
+            values = self.callback()
+        except Exception:
+            # A failing probe skips the series rather than the whole scrape
+            return {}
+        return values if isinstance(values, dict) else {(): values}
+
+    def samples(self):
+        """Yield (suffix, label text, value) for every exposed series"""
+        for key, value in sorted(self._snapshot().items()):
+            yield "", _format_labels(self.labels, key), value
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(f"{self.name}{suffix}{labels} {_format_value(value)}" for suffix, labels, value in self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        if not self.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), enabled=True, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels, enabled)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        if not self.enabled:
+            return
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # Per-bucket counts (last one is +Inf), then sum
+                series = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self._lock:
+            snapshot = {key: list(series) for key, series in self._values.items()}
+        for key, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series):
+                cumulative += count
+                yield "_bucket", _format_labels(self.labels, key, [("le", _format_value(float(bound)))]), cumulative
+            yield "_sum", _format_labels(self.labels, key), series[-1]
+            yield "_count", _format_labels(self.labels, key), cumulative
+
+
+class MetricsRegistry:
+    """Named metrics rendered together in the Prometheus text exposition format"""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help_text, labels=(), callback=None):
+        return self._register(Counter(name, help_text, labels, self.enabled, callback))
+
+    def gauge(self, name, help_text, labels=(), callback=None):
+        return self._register(Gauge(name, help_text, labels, self.enabled, callback))
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, labels, self.enabled, buckets))
+
+    def expose(self):
+        """All metrics as Prometheus text exposition"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.expose() for metric in metrics) + "\n"
+
+
+registry = MetricsRegistry(METRICS_ENABLED)
+
+reruns_total = registry.counter(
+    "taskmgr_reruns_total", "Script reruns by page", ("page",))
+rerun_duration = registry.histogram(
+    "taskmgr_rerun_duration_seconds", "Full rerun duration by page", ("page",))
+query_duration = registry.histogram(
+    "taskmgr_query_duration_seconds", "SQL statement duration by statement type", ("statement",))
+write_duration = registry.histogram(
+    "taskmgr_write_duration_seconds", "Task write latency including write queue wait", ("operation",))
+task_operations = registry.counter(
+    "taskmgr_task_operations_total", "Task writes by operation", ("operation",))
+login_attempts = registry.counter(
+    "taskmgr_login_attempts_total", "Login attempts by result", ("result",))
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def touch_session(session_id):
+    """Record activity from a browser session"""
+    if not METRICS_ENABLED:
+        return
+    now = time.monotonic()
+    with _sessions_lock:
+        _sessions[session_id] = now
+        # Forget long-idle sessions so the dict stays small
+        if len(_sessions) > 1000:
+            for stale in [sid for sid, seen in _sessions.items() if now - seen > SESSION_ACTIVE_WINDOW]:
+                del _sessions[stale]
+
+
+def _active_sessions():
+    now = time.monotonic()
+    with _sessions_lock:
+        return sum(1 for seen in _sessions.values() if now - seen <= SESSION_ACTIVE_WINDOW)
+
+
+def _file_sizes():
+    sizes = {}
+    for kind, suffix in (("database", ""), ("wal", "-wal")):
+        path = f"{DATABASE_PATH}{suffix}"
+        sizes[(kind,)] = os.path.getsize(path) if os.path.exists(path) else 0
+    return sizes
+
+
+def _write_queue_depth():
+    from queue_utils import get_write_queue_stats
+    return get_write_queue_stats()['depth']
+
+
+def _pool_counters():
+    from db_utils import get_pool_stats
+    stats = get_pool_stats()
+    return {(key,): stats[key] for key in ('reads', 'writes', 'busy_retries', 'opened')}
+
+
+registry.gauge("taskmgr_active_sessions", f"Sessions active in the last {SESSION_ACTIVE_WINDOW}s",
+               callback=_active_sessions)
+registry.gauge("taskmgr_db_file_bytes", "Size of the database and WAL files", ("file",), callback=_file_sizes)
+registry.gauge("taskmgr_write_queue_depth", "Writes waiting for the writer thread", callback=_write_queue_depth)
+registry.counter("taskmgr_pool_operations_total", "Connection pool operations by kind", ("kind",),
+                 callback=_pool_counters)
+
+
+def write_metrics_file(path):
+    """Write the current exposition to path atomically (e.g. for node_exporter's textfile collector)"""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as out:
+        out.write(registry.expose())
+    os.replace(tmp, path)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.expose().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_exporters_started = False
+_exporters_lock = threading.Lock()
+
+
+def start_exporters():
+    """
+    Start the configured exporters once per process
+
+    METRICS_PORT serves /metrics on localhost; METRICS_FILE is rewritten
+    every METRICS_FILE_INTERVAL seconds. Both run on daemon threads.
+    """
+    global _exporters_started
+    if _exporters_started or not METRICS_ENABLED:
+        return
+    with _exporters_lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+
+        if METRICS_PORT:
+            try:
+                server = ThreadingHTTPServer(("127.0.0.1", METRICS_PORT), _MetricsHandler)
+            except OSError as e:
+                # E.g. the port is taken; the app keeps running without the endpoint
+                print(f"Metrics endpoint not started on port {METRICS_PORT}: {e}")
+            else:
+                threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+
+        if METRICS_FILE:
+            def write_periodically():
+                while True:
+                    try:
+                        write_metrics_file(METRICS_FILE)
+                    except OSError:
+                        pass
+                    time.sleep(METRICS_FILE_INTERVAL)
+            threading.Thread(target=write_periodically, name="metrics-file", daemon=True).start()
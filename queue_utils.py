@@ -0,0 +1,177 @@
+import threading
+import queue
+import time
+from concurrent.futures import Future
+from config import WRITE_QUEUE_ENABLED, WRITE_BATCH_SIZE, WRITE_MAX_DELAY
+from db_utils import write_connection, in_write_transaction, begin_immediate, retry_busy
+
+
+class WriteQueue:
+    """
+    In-process write queue drained by a single writer thread
+
+    Writes submitted from any session are grouped into one transaction of up
+    to max_batch_size operations, waiting at most max_delay seconds for the
+    batch to fill. Each operation runs inside its own savepoint, so a failing
+    operation only fails its own future.
+    """
+
+    def __init__(self, max_batch_size=64, max_delay=0.0):
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+
+        self._pending = queue.Queue()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'batches': 0,
+            'operations': 0,
+            'failed_operations': 0,
+            'failed_batches': 0,
+            'largest_batch': 0,
+            'commit_time_total': 0.0,
+            'commit_time_last': 0.0,
+            'commit_time_max': 0.0
+        }
+
+    def submit(self, op, *args, **kwargs):
+        """Queue op(cursor, *args, **kwargs) and return a Future for its result"""
+        self._ensure_thread()
+        future = Future()
+        self._pending.put((op, args, kwargs, future))
+        return future
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._thread_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+                    self._thread.start()
+
+    def _collect_batch(self):
+        # Writes queued while the previous commit ran are always picked up; a
+        # positive max_delay additionally holds the batch open for stragglers
+        batch = [self._pending.get()]
+        deadline = time.perf_counter() + self.max_delay
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining > 0:
+                    batch.append(self._pending.get(timeout=remaining))
+                else:
+                    batch.append(self._pending.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            self._commit_batch(batch)
+
+    def _commit_batch(self, batch):
+        started = time.perf_counter()
+        try:
+            outcomes, failed = retry_busy(lambda: self._write_batch(batch))
+        except Exception as e:
+            # BEGIN or COMMIT failed: nothing in the batch was written
+            for _, _, _, future in batch:
+                future.set_exception(e)
+            self._record(len(batch), len(batch), time.perf_counter() - started, batch_failed=True)
+            return
+
+        # Resolve futures only after the commit so callers never read ahead of it
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+        self._record(len(batch), failed, time.perf_counter() - started)
+
+    def _write_batch(self, batch):
+        outcomes = []
+        failed = 0
+        with write_connection() as conn:
+            cursor = conn.cursor()
+            begin_immediate(conn)
+            for op, args, kwargs, future in batch:
+                cursor.execute("SAVEPOINT queued_write")
+                try:
+                    outcomes.append((future, op(cursor, *args, **kwargs), None))
+                    cursor.execute("RELEASE queued_write")
+                except Exception as e:
+                    cursor.execute("ROLLBACK TO queued_write")
+                    cursor.execute("RELEASE queued_write")
+                    outcomes.append((future, None, e))
+                    failed += 1
+        return outcomes, failed
+
+    def _record(self, size, failed, elapsed, batch_failed=False):
+        with self._stats_lock:
+            self._stats['batches'] += 1
+            self._stats['operations'] += size
+            self._stats['failed_operations'] += failed
+            self._stats['failed_batches'] += int(batch_failed)
+            self._stats['largest_batch'] = max(self._stats['largest_batch'], size)
+            self._stats['commit_time_total'] += elapsed
+            self._stats['commit_time_last'] = elapsed
+            self._stats['commit_time_max'] = max(self._stats['commit_time_max'], elapsed)
+
+    def stats(self):
+        """Queue depth, batch counts and commit latency"""
+        with self._stats_lock:
+            snapshot = dict(self._stats)
+        snapshot['depth'] = self._pending.qsize()
+        batches = snapshot['batches']
+        snapshot['commit_time_avg'] = snapshot['commit_time_total'] / batches if batches else 0.0
+        snapshot['avg_batch_size'] = snapshot['operations'] / batches if batches else 0.0
+        return snapshot
+
+
+_write_queue = None
+_write_queue_lock = threading.Lock()
+
+
+def get_write_queue():
+    """Return the process-wide write queue, creating it on first use"""
+    global _write_queue
+    if _write_queue is None:
+        with _write_queue_lock:
+            if _write_queue is None:
+                _write_queue = WriteQueue(WRITE_BATCH_SIZE, WRITE_MAX_DELAY)
+    return _write_queue
+
+
+def submit_write(op, *args, **kwargs):
+    """
+    Run op(cursor, *args, **kwargs) as a write and return a Future for its result
+
+    Inside an open write transaction (or with the queue disabled) the op runs
+    immediately on the caller's connection, since queueing it would wait on
+    the lock the caller already holds.
+    """
+    if not WRITE_QUEUE_ENABLED or in_write_transaction():
+        def write():
+            with write_connection() as conn:
+                return op(conn.cursor(), *args, **kwargs)
+
+        future = Future()
+        try:
+            # A nested write cannot be retried on its own; its transaction owner retries
+            future.set_result(write() if in_write_transaction() else retry_busy(write))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    return get_write_queue().submit(op, *args, **kwargs)
+
+
+def run_write(op, *args, **kwargs):
+    """Run a write through the queue and wait for its committed result"""
+    return submit_write(op, *args, **kwargs).result()
+
+
+def get_write_queue_stats():
+    """Stats of the shared write queue (empty counters if it was never used)"""
+    return get_write_queue().stats()
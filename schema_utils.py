@@ -0,0 +1,367 @@
+import sqlite3
+import threading
+from datetime import datetime
+from auth_utils import hash_password
+from db_utils import write_connection, begin_immediate, retry_busy
+
+
+def _create_users_table(cursor):
+    """Users table plus the default boss and database accounts"""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS users (
+        username TEXT PRIMARY KEY,
+        password TEXT NOT NULL,
+        role TEXT NOT NULL
+    )
+    ''')
+
+    default_users = [
+        ("Shammi Kapoor", hash_password("admin123"), "boss"),
+        ("DatabaseAdmin", hash_password("database123"), "database")
+    ]
+    cursor.executemany('''
+    INSERT OR IGNORE INTO users (username, password, role)
+    VALUES (?, ?, ?)
+    ''', default_users)
+
+
+def _create_task_tables(cursor):
+    """Tasks, task_assignments and messages tables"""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS tasks (
+        task_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        description TEXT NOT NULL,
+        assigned_by TEXT NOT NULL,
+        due_date TEXT NOT NULL,
+        status TEXT NOT NULL,
+        created_at TEXT NOT NULL
+    )
+    ''')
+
+    # Many-to-many relationship between tasks and users
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS task_assignments (
+        task_id INTEGER,
+        assigned_to TEXT,
+        PRIMARY KEY (task_id, assigned_to),
+        FOREIGN KEY (task_id) REFERENCES tasks (task_id)
+    )
+    ''')
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS messages (
+        message_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        task_id INTEGER,
+        sender TEXT NOT NULL,
+        message TEXT NOT NULL,
+        timestamp TEXT NOT NULL,
+        message_type TEXT,
+        FOREIGN KEY (task_id) REFERENCES tasks (task_id)
+    )
+    ''')
+
+
+def _add_hot_path_indexes(cursor):
+    """Indexes behind the member task list, task chat and per-user stats"""
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_task_assignments_assignee
+    ON task_assignments (assigned_to, task_id)
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_messages_task_timestamp
+    ON messages (task_id, timestamp)
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_tasks_assigned_by
+    ON tasks (assigned_by)
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_tasks_created_at
+    ON tasks (created_at)
+    ''')
+
+
+def _denormalize_task_counters(cursor):
+    """Keep message_count and a JSON assignee list on each task row via triggers"""
+    cursor.execute("ALTER TABLE tasks ADD COLUMN message_count INTEGER NOT NULL DEFAULT 0")
+    cursor.execute("ALTER TABLE tasks ADD COLUMN assigned_users TEXT NOT NULL DEFAULT '[]'")
+
+    # Backfill existing rows
+    cursor.execute('''
+    UPDATE tasks SET
+        message_count = (SELECT COUNT(*) FROM messages m WHERE m.task_id = tasks.task_id),
+        assigned_users = (SELECT json_group_array(ta.assigned_to)
+                          FROM task_assignments ta WHERE ta.task_id = tasks.task_id)
+    ''')
+
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_messages_count_insert
+    AFTER INSERT ON messages
+    BEGIN
+        UPDATE tasks SET message_count = message_count + 1 WHERE task_id = NEW.task_id;
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_messages_count_delete
+    AFTER DELETE ON messages
+    BEGIN
+        UPDATE tasks SET message_count = message_count - 1 WHERE task_id = OLD.task_id;
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_messages_count_move
+    AFTER UPDATE OF task_id ON messages
+    WHEN OLD.task_id IS NOT NEW.task_id
+    BEGIN
+        UPDATE tasks SET message_count = message_count - 1 WHERE task_id = OLD.task_id;
+        UPDATE tasks SET message_count = message_count + 1 WHERE task_id = NEW.task_id;
+    END
+    ''')
+
+    # Assignee lists are rebuilt from the (task_id, assigned_to) primary key index,
+    # which costs one lookup per assignee of the touched task only
+    refresh_assignees = '''
+        UPDATE tasks SET assigned_users = (
+            SELECT json_group_array(ta.assigned_to)
+            FROM task_assignments ta WHERE ta.task_id = {ref}.task_id
+        ) WHERE task_id = {ref}.task_id;
+    '''
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS trg_assignments_insert
+    AFTER INSERT ON task_assignments
+    BEGIN
+        {refresh_assignees.format(ref='NEW')}
+    END
+    ''')
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS trg_assignments_delete
+    AFTER DELETE ON task_assignments
+    BEGIN
+        {refresh_assignees.format(ref='OLD')}
+    END
+    ''')
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS trg_assignments_update
+    AFTER UPDATE ON task_assignments
+    BEGIN
+        {refresh_assignees.format(ref='OLD')}
+        {refresh_assignees.format(ref='NEW')}
+    END
+    ''')
+
+
+# Recomputes user_task_stats from scratch; shared by the migration backfill and
+# task_utils.rebuild_user_task_stats()
+USER_TASK_STATS_REBUILD = '''
+INSERT INTO user_task_stats (username, total, pending, in_progress, completed, followup_needed)
+SELECT ta.assigned_to,
+       COUNT(*),
+       SUM(t.status = 'pending'),
+       SUM(t.status = 'in_progress'),
+       SUM(t.status = 'completed'),
+       SUM(t.status = 'followup_needed')
+FROM tasks t
+JOIN task_assignments ta ON t.task_id = ta.task_id
+GROUP BY ta.assigned_to
+'''
+
+
+def _materialize_user_task_stats(cursor):
+    """Per-user task counts kept current by triggers on tasks and task_assignments"""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS user_task_stats (
+        username TEXT PRIMARY KEY,
+        total INTEGER NOT NULL DEFAULT 0,
+        pending INTEGER NOT NULL DEFAULT 0,
+        in_progress INTEGER NOT NULL DEFAULT 0,
+        completed INTEGER NOT NULL DEFAULT 0,
+        followup_needed INTEGER NOT NULL DEFAULT 0
+    )
+    ''')
+    cursor.execute("DELETE FROM user_task_stats")
+    cursor.execute(USER_TASK_STATS_REBUILD)
+
+    # Add or remove one task (status taken from tasks row {task}) for user {user}.
+    # Only assignments whose task exists count, matching the JOIN in the rebuild.
+    # Correlated subqueries rather than UPDATE ... FROM, which needs SQLite 3.33.
+    add_assignment = '''
+        INSERT INTO user_task_stats (username, total, pending, in_progress, completed, followup_needed)
+        SELECT {user}, 1, t.status = 'pending', t.status = 'in_progress',
+               t.status = 'completed', t.status = 'followup_needed'
+        FROM tasks t WHERE t.task_id = {task}
+        ON CONFLICT (username) DO UPDATE SET
+            total = total + 1,
+            pending = pending + excluded.pending,
+            in_progress = in_progress + excluded.in_progress,
+            completed = completed + excluded.completed,
+            followup_needed = followup_needed + excluded.followup_needed;
+    '''
+    remove_assignment = '''
+        UPDATE user_task_stats SET
+            (total, pending, in_progress, completed, followup_needed) = (
+                SELECT total - 1,
+                       pending - (t.status = 'pending'),
+                       in_progress - (t.status = 'in_progress'),
+                       completed - (t.status = 'completed'),
+                       followup_needed - (t.status = 'followup_needed')
+                FROM tasks t WHERE t.task_id = {task}
+            )
+        WHERE username = {user} AND EXISTS (SELECT 1 FROM tasks WHERE task_id = {task});
+    '''
+
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS trg_stats_assignment_insert
+    AFTER INSERT ON task_assignments
+    BEGIN
+        {add_assignment.format(user='NEW.assigned_to', task='NEW.task_id')}
+    END
+    ''')
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS trg_stats_assignment_delete
+    AFTER DELETE ON task_assignments
+    BEGIN
+        {remove_assignment.format(user='OLD.assigned_to', task='OLD.task_id')}
+    END
+    ''')
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS trg_stats_assignment_update
+    AFTER UPDATE ON task_assignments
+    BEGIN
+        {remove_assignment.format(user='OLD.assigned_to', task='OLD.task_id')}
+        {add_assignment.format(user='NEW.assigned_to', task='NEW.task_id')}
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_stats_task_status
+    AFTER UPDATE OF status ON tasks
+    WHEN OLD.status IS NOT NEW.status
+    BEGIN
+        UPDATE user_task_stats SET
+            pending = pending - (OLD.status = 'pending') + (NEW.status = 'pending'),
+            in_progress = in_progress - (OLD.status = 'in_progress') + (NEW.status = 'in_progress'),
+            completed = completed - (OLD.status = 'completed') + (NEW.status = 'completed'),
+            followup_needed = followup_needed - (OLD.status = 'followup_needed') + (NEW.status = 'followup_needed')
+        WHERE username IN (SELECT assigned_to FROM task_assignments WHERE task_id = NEW.task_id);
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_stats_task_delete
+    AFTER DELETE ON tasks
+    BEGIN
+        UPDATE user_task_stats SET
+            total = total - 1,
+            pending = pending - (OLD.status = 'pending'),
+            in_progress = in_progress - (OLD.status = 'in_progress'),
+            completed = completed - (OLD.status = 'completed'),
+            followup_needed = followup_needed - (OLD.status = 'followup_needed')
+        WHERE username IN (SELECT assigned_to FROM task_assignments WHERE task_id = OLD.task_id);
+    END
+    ''')
+
+
+# Ordered (version, description, step) entries. Steps must be safe to run
+# against databases created before versioning existed, so the first ones
+# use IF NOT EXISTS / OR IGNORE. Append new steps; never edit applied ones.
+MIGRATIONS = [
+    (1, "create users table and default accounts", _create_users_table),
+    (2, "create tasks, task_assignments and messages tables", _create_task_tables),
+    (3, "add indexes for task list, chat and stats queries", _add_hot_path_indexes),
+    (4, "denormalize message_count and assigned_users onto tasks", _denormalize_task_counters),
+    (5, "materialize per-user task statistics", _materialize_user_task_stats),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+
+def get_schema_version(cursor):
+    """Return the highest applied migration version (0 for a fresh database)"""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        description TEXT NOT NULL,
+        applied_at TEXT NOT NULL
+    )
+    ''')
+    cursor.execute("SELECT MAX(version) FROM schema_version")
+    return cursor.fetchone()[0] or 0
+
+
+def migrate():
+    """Apply every pending migration, one transaction per step"""
+    with write_connection() as conn:
+        if get_schema_version(conn.cursor()) >= LATEST_VERSION:
+            return []
+
+    applied = []
+    for version, description, step in MIGRATIONS:
+        if retry_busy(lambda: _apply_migration(version, description, step)):
+            applied.append(version)
+    return applied
+
+
+def _apply_migration(version, description, step):
+    """Apply one migration in its own transaction; False if it was already applied"""
+    with write_connection() as conn:
+        cursor = conn.cursor()
+        # Take the write lock first so concurrent processes migrate in turn
+        begin_immediate(conn)
+        if get_schema_version(cursor) >= version:
+            return False
+
+        step(cursor)
+        _record_migration(cursor, version, description)
+    return True
+
+
+def _record_migration(cursor, version, description):
+    cursor.execute('''
+    INSERT INTO schema_version (version, description, applied_at)
+    VALUES (?, ?, ?)
+    ''', (version, description, datetime.now().isoformat()))
+
+
+def migrate_database_file(path):
+    """
+    Apply every pending migration to a database file the pool does not serve
+
+    Used on a staged restore so the file is already current when it is
+    swapped in. Returns the applied versions.
+    """
+    conn = sqlite3.connect(path)
+    try:
+        cursor = conn.cursor()
+        applied = []
+        for version, description, step in MIGRATIONS:
+            conn.execute("BEGIN IMMEDIATE")
+            if get_schema_version(cursor) >= version:
+                conn.rollback()
+                continue
+            step(cursor)
+            _record_migration(cursor, version, description)
+            conn.commit()
+            applied.append(version)
+        return applied
+    finally:
+        conn.close()
+
+
+def ensure_schema():
+    """Migrate the database once per process; later calls are free"""
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _schema_lock:
+        if not _schema_ready:
+            migrate()
+            _schema_ready = True
+
+
+def reset_schema_check():
+    """Force the next ensure_schema() call to re-check the database"""
+    global _schema_ready
+    with _schema_lock:
+        _schema_ready = False
@@ -0,0 +1,122 @@
+import pandas as pd
+from db_utils import write_connection, begin_immediate, retry_busy
+
+# Keys per DELETE ... IN (...) statement, well under SQLite's bound-parameter limit
+DELETE_CHUNK_SIZE = 500
+
+
+def quote_identifier(name):
+    """Quote a table or column name for use in SQL"""
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _to_sql_value(value):
+    # numpy scalars and NaN/NaT are not valid SQLite parameters
+    if value is None or (not isinstance(value, (list, dict)) and pd.isna(value)):
+        return None
+    return value.item() if hasattr(value, 'item') else value
+
+
+def diff_frames(original_df, edited_df, primary_key):
+    """
+    Compare an edited copy of a table against the rows it was loaded from
+
+    Rows are matched on primary_key with index alignment instead of comparing
+    every edited row against every original one, so the cost grows with the
+    table size rather than its square.
+
+    Args:
+        original_df: rows as read from the database
+        edited_df: the same rows after editing; new rows may have no key
+        primary_key: name of the key column
+
+    Returns:
+        (delete_keys, updates, inserts): keys of removed rows, changed rows as
+        dicts holding every column, and new rows as dicts without their
+        empty columns
+    """
+    value_columns = [col for col in original_df.columns if col != primary_key]
+
+    new_mask = edited_df[primary_key].isna() | ~edited_df[primary_key].isin(original_df[primary_key])
+    existing = edited_df[~new_mask]
+    try:
+        # Adding a row turns an integer key column into floats in the editor
+        existing = existing.astype({primary_key: original_df[primary_key].dtype})
+    except (TypeError, ValueError):
+        pass
+
+    delete_keys = original_df.loc[~original_df[primary_key].isin(existing[primary_key]), primary_key]
+
+    updates = []
+    if value_columns and not existing.empty:
+        new_values = existing.set_index(primary_key)[value_columns]
+        old_values = original_df.set_index(primary_key).loc[new_values.index, value_columns]
+
+        # Elementwise on object arrays so 1 and 1.0 compare equal; two empty cells are unchanged
+        new_array = new_values.to_numpy(dtype=object)
+        old_array = old_values.to_numpy(dtype=object)
+        both_empty = new_values.isna().to_numpy() & old_values.isna().to_numpy()
+        changed = ((new_array != old_array) & ~both_empty).any(axis=1)
+
+        for key, row in zip(new_values.index[changed], new_array[changed]):
+            record = dict(zip(value_columns, row))
+            record[primary_key] = key
+            updates.append(record)
+
+    inserts = []
+    for record in edited_df[new_mask].to_dict('records'):
+        inserts.append({col: value for col, value in record.items() if _to_sql_value(value) is not None})
+
+    return [_to_sql_value(key) for key in delete_keys], updates, inserts
+
+
+def apply_table_changes(table_name, primary_key, delete_keys, updates, inserts):
+    """
+    Write the output of diff_frames to table_name in a single transaction
+
+    Deletes are sent as chunked DELETE ... IN statements, updates as one
+    executemany, and inserts as one executemany per distinct column set.
+
+    Returns:
+        Dict with 'deleted', 'updated' and 'inserted' row counts
+    """
+    table = quote_identifier(table_name)
+    key = quote_identifier(primary_key)
+
+    def write():
+        with write_connection() as conn:
+            cursor = conn.cursor()
+            begin_immediate(conn)
+
+            for start in range(0, len(delete_keys), DELETE_CHUNK_SIZE):
+                chunk = delete_keys[start:start + DELETE_CHUNK_SIZE]
+                cursor.execute(
+                    f"DELETE FROM {table} WHERE {key} IN ({', '.join('?' * len(chunk))})",
+                    chunk
+                )
+
+            if updates:
+                update_columns = [col for col in updates[0] if col != primary_key]
+                assignments = ', '.join(f"{quote_identifier(col)} = ?" for col in update_columns)
+                cursor.executemany(
+                    f"UPDATE {table} SET {assignments} WHERE {key} = ?",
+                    [[_to_sql_value(row[col]) for col in update_columns] + [_to_sql_value(row[primary_key])]
+                     for row in updates]
+                )
+
+            # Rows leave their empty columns to the table defaults, so group by column set
+            by_columns = {}
+            for row in inserts:
+                by_columns.setdefault(tuple(row), []).append([_to_sql_value(v) for v in row.values()])
+            for insert_columns, values in by_columns.items():
+                if not insert_columns:
+                    cursor.executemany(f"INSERT INTO {table} DEFAULT VALUES", [()] * len(values))
+                    continue
+                cursor.executemany(
+                    f"INSERT INTO {table} ({', '.join(quote_identifier(col) for col in insert_columns)}) "
+                    f"VALUES ({', '.join('?' * len(insert_columns))})",
+                    values
+                )
+
+    retry_busy(write)
+    return {'deleted': len(delete_keys), 'updated': len(updates), 'inserted': len(inserts)}
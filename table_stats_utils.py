@@ -0,0 +1,177 @@
+import sqlite3
+import threading
+import time
+from db_utils import read_connection, write_connection
+from sync_utils import quote_identifier
+from table_utils import estimate_row_count
+from config import TABLE_STATS_MAX_AGE, ANALYZE_ROW_LIMIT
+
+
+def _btree_usage(cursor):
+    """
+    Pages and bytes used by every table and index b-tree, keyed by name
+
+    Reads dbstat in aggregate mode (one row per b-tree). Returns None when
+    SQLite was built without the dbstat virtual table.
+    """
+    try:
+        cursor.execute("SELECT name, pageno, pgsize, payload, unused FROM dbstat WHERE aggregate = 1")
+    except sqlite3.OperationalError:
+        return None
+    return {
+        row[0]: {'pages': row[1], 'bytes': row[2], 'payload': row[3], 'unused': row[4]}
+        for row in cursor.fetchall()
+    }
+
+
+def collect_table_stats():
+    """
+    Gather size and shape statistics for every table without counting rows
+
+    Row counts are the ANALYZE estimates from sqlite_stat1 (falling back to
+    the largest rowid), and page usage comes from dbstat, so the cost grows
+    with the number of pages rather than rows and nothing is sorted or
+    counted. Meant to run in the background; see get_table_stats.
+
+    Returns:
+        Dict with 'collected' (timestamp), 'database' (page_size, page_count,
+        freelist_count, file_bytes, free_bytes, fragmentation) and 'tables',
+        a list of dicts with name, rows, columns, pages, bytes, payload,
+        unused and 'indexes' (the same usage fields per index)
+    """
+    with read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA page_size")
+        page_size = cursor.fetchone()[0]
+        cursor.execute("PRAGMA page_count")
+        page_count = cursor.fetchone()[0]
+        cursor.execute("PRAGMA freelist_count")
+        freelist_count = cursor.fetchone()[0]
+
+        cursor.execute('''
+        SELECT type, name, tbl_name FROM sqlite_master
+        WHERE type IN ('table', 'index') AND name NOT LIKE 'sqlite_%'
+        ORDER BY name
+        ''')
+        objects = cursor.fetchall()
+
+        indexes = {}
+        for kind, name, table in objects:
+            if kind == 'index':
+                indexes.setdefault(table, []).append(name)
+
+        usage = _btree_usage(cursor) or {}
+        tables = []
+        for kind, name, _ in objects:
+            if kind != 'table':
+                continue
+            # table_info reads the schema only, never the table's rows
+            cursor.execute(f"PRAGMA table_info({quote_identifier(name)})")
+            columns = [
+                {'name': col[1], 'type': col[2], 'notnull': bool(col[3]), 'pk': bool(col[5])}
+                for col in cursor.fetchall()
+            ]
+            btree = usage.get(name, {})
+            tables.append({
+                'name': name,
+                'columns': columns,
+                'pages': btree.get('pages'),
+                'bytes': btree.get('bytes'),
+                'payload': btree.get('payload'),
+                'unused': btree.get('unused'),
+                'indexes': [
+                    dict({'pages': None, 'bytes': None, 'payload': None, 'unused': None},
+                         **usage.get(index, {}), name=index)
+                    for index in indexes.get(name, [])
+                ]
+            })
+
+    for table in tables:
+        try:
+            table['rows'] = estimate_row_count(table['name'])
+        except sqlite3.OperationalError:
+            # WITHOUT ROWID tables have no rowid to fall back on
+            table['rows'] = None
+
+    return {
+        'collected': time.time(),
+        'dbstat': bool(usage),
+        'database': {
+            'page_size': page_size,
+            'page_count': page_count,
+            'freelist_count': freelist_count,
+            'file_bytes': page_size * page_count,
+            'free_bytes': page_size * freelist_count,
+            'fragmentation': freelist_count / page_count if page_count else 0.0
+        },
+        'tables': tables
+    }
+
+
+def analyze_database(row_limit=ANALYZE_ROW_LIMIT):
+    """
+    Refresh the sqlite_stat1 row estimates with ANALYZE
+
+    analysis_limit makes ANALYZE sample about row_limit rows per index
+    instead of reading each one in full (0 reads everything).
+    """
+    with write_connection() as conn:
+        conn.execute(f"PRAGMA analysis_limit = {int(row_limit)}")
+        conn.execute("ANALYZE")
+
+
+class TableStatsService:
+    """
+    Latest table statistics, recollected on a background thread when stale
+
+    Readers always get the last snapshot immediately; at most one collection
+    runs at a time.
+    """
+
+    def __init__(self, max_age=300):
+        self.max_age = max_age
+        self.snapshot = None
+        self.error = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def refreshing(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def get(self):
+        """The current snapshot (None before the first collection), refreshing it in the background if stale"""
+        snapshot = self.snapshot
+        if snapshot is None or time.time() - snapshot['collected'] > self.max_age:
+            self.refresh()
+        return snapshot
+
+    def refresh(self, wait=False):
+        """Start a collection unless one is already running; wait=True blocks until it is done"""
+        with self._lock:
+            if not self.refreshing:
+                self._thread = threading.Thread(target=self._collect, name="table-stats", daemon=True)
+                self._thread.start()
+            thread = self._thread
+        if wait:
+            thread.join()
+        return self.snapshot
+
+    def invalidate(self):
+        """Forget the snapshot, e.g. after the database file was replaced"""
+        self.snapshot = None
+
+    def _collect(self):
+        try:
+            self.snapshot = collect_table_stats()
+            self.error = None
+        except Exception as e:
+            self.error = e
+
+
+table_stats = TableStatsService(TABLE_STATS_MAX_AGE)
+
+
+def get_table_stats():
+    """Cached table statistics; None until the first background collection finishes"""
+    return table_stats.get()
@@ -0,0 +1,156 @@
+from db_utils import read_connection
+from cache_utils import cached_query
+from sync_utils import quote_identifier
+
+# Hidden key column added to every browsed row; rowid is unique even for
+# tables with composite or text primary keys
+ROWID_COLUMN = "rowid"
+
+
+@cached_query()
+def list_tables():
+    """Names of all user tables in the database"""
+    with read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name")
+        return [row[0] for row in cursor.fetchall()]
+
+
+@cached_query()
+def get_table_columns(table_name):
+    """Column names of table_name in declaration order"""
+    with read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"PRAGMA table_info({quote_identifier(table_name)})")
+        return [row[1] for row in cursor.fetchall()]
+
+
+def _filter_clause(table_name, filters):
+    # filters maps column name to a substring; unknown columns are rejected so
+    # only validated identifiers ever reach the SQL text
+    columns = get_table_columns(table_name)
+    conditions = []
+    params = []
+    for column, text in sorted((filters or {}).items()):
+        if column not in columns:
+            raise ValueError(f"Unknown column {column!r} for table {table_name}")
+        if text == "":
+            continue
+        escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        conditions.append(f"{quote_identifier(column)} LIKE ? ESCAPE '\\'")
+        params.append(f"%{escaped}%")
+    return conditions, params
+
+
+def _keyset_clause(sort_column, descending, after):
+    # Rows are ordered by (sort_column, rowid), with SQLite's NULL placement:
+    # first when ascending, last when descending
+    last_value, last_rowid = after
+    sort = quote_identifier(sort_column)
+    if descending:
+        if last_value is None:
+            return f"({sort} IS NULL AND {ROWID_COLUMN} < ?)", [last_rowid]
+        return (f"({sort} < ? OR ({sort} = ? AND {ROWID_COLUMN} < ?) OR {sort} IS NULL)",
+                [last_value, last_value, last_rowid])
+    if last_value is None:
+        return f"(({sort} IS NULL AND {ROWID_COLUMN} > ?) OR {sort} IS NOT NULL)", [last_rowid]
+    return f"({sort} > ? OR ({sort} = ? AND {ROWID_COLUMN} > ?))", [last_value, last_value, last_rowid]
+
+
+@cached_query()
+def fetch_table_page(table_name, filters=None, sort_column=None, descending=False, after=None, limit=100):
+    """
+    Read one page of a table with filtering and sorting done in SQL
+
+    Args:
+        table_name: table to browse
+        filters: dict of column name to substring the column must contain
+        sort_column: column to order by (rowid order when None)
+        descending: reverse the sort order
+        after: cursor returned with the previous page, None for the first page
+        limit: rows per page
+
+    Returns:
+        (columns, rows, next_cursor): column names starting with the rowid
+        column, rows as tuples, and the cursor for the following page (None
+        on the last page)
+    """
+    columns = get_table_columns(table_name)
+    if sort_column is not None and sort_column not in columns:
+        raise ValueError(f"Unknown column {sort_column!r} for table {table_name}")
+
+    conditions, params = _filter_clause(table_name, filters)
+    direction = "DESC" if descending else "ASC"
+    if sort_column is None:
+        order = f"{ROWID_COLUMN} {direction}"
+        if after is not None:
+            conditions.append(f"{ROWID_COLUMN} {'<' if descending else '>'} ?")
+            params.append(after[1])
+    else:
+        order = f"{quote_identifier(sort_column)} {direction}, {ROWID_COLUMN} {direction}"
+        if after is not None:
+            condition, keyset_params = _keyset_clause(sort_column, descending, after)
+            conditions.append(condition)
+            params.extend(keyset_params)
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    query = f'''
+    SELECT {ROWID_COLUMN} AS {ROWID_COLUMN}, {', '.join(quote_identifier(col) for col in columns)}
+    FROM {quote_identifier(table_name)}
+    {where}
+    ORDER BY {order}
+    LIMIT ?
+    '''
+
+    with read_connection() as conn:
+        cursor = conn.cursor()
+        # One extra row tells whether another page exists
+        cursor.execute(query, params + [limit + 1])
+        rows = [tuple(row) for row in cursor.fetchall()]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        sort_value = last[columns.index(sort_column) + 1] if sort_column is not None else None
+        next_cursor = (sort_value, last[0])
+    return [ROWID_COLUMN] + columns, rows, next_cursor
+
+
+@cached_query()
+def estimate_row_count(table_name):
+    """
+    Approximate number of rows in table_name without counting them
+
+    Uses the row estimate ANALYZE stored in sqlite_stat1 when there is one,
+    otherwise the largest rowid, which only overestimates after deletes.
+    """
+    with read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='sqlite_stat1'")
+        if cursor.fetchone():
+            cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = ? LIMIT 1", (table_name,))
+            row = cursor.fetchone()
+            if row and row[0]:
+                return int(row[0].split()[0])
+        cursor.execute(f"SELECT MAX({ROWID_COLUMN}) FROM {quote_identifier(table_name)}")
+        return cursor.fetchone()[0] or 0
+
+
+@cached_query()
+def count_matching_rows(table_name, filters, cap=10000):
+    """
+    Count rows matching filters, stopping at cap
+
+    Returns:
+        The match count; a result of cap + 1 means "more than cap"
+    """
+    conditions, params = _filter_clause(table_name, filters)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    with read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"SELECT COUNT(*) FROM (SELECT 1 FROM {quote_identifier(table_name)} {where} LIMIT ?)",
+            params + [cap + 1]
+        )
+        return cursor.fetchone()[0]
@@ -1,191 +1,538 @@
+import json
 import sqlite3
-from datetime import datetime
-from config import DATABASE_PATH
+import time
+from datetime import date, datetime
+from contextlib import contextmanager
+from db_utils import read_connection, write_connection, begin_immediate, in_write_transaction, retry_busy
+from queue_utils import run_write
+from cache_utils import cached_query
+from trace_utils import traced
+from schema_utils import USER_TASK_STATS_REBUILD
+from metrics_utils import task_operations, write_duration
 
-def init_task_database():
-    """Initialize tasks and messages tables"""
-    with sqlite3.connect(DATABASE_PATH) as conn:
-        cursor = conn.cursor()
+TASK_STATUSES = ('pending', 'in_progress', 'completed', 'followup_needed')
+
+# Hot-path queries, kept at module level so check_query_plans.py can EXPLAIN them
+BOSS_TASKS_QUERY = '''
+SELECT * FROM tasks
+ORDER BY created_at DESC
+'''
+
+MEMBER_TASKS_QUERY = '''
+SELECT * FROM tasks
+WHERE task_id IN (
+    SELECT task_id FROM task_assignments WHERE assigned_to = ?
+    UNION
+    SELECT task_id FROM tasks WHERE assigned_by = ?
+)
+ORDER BY created_at DESC
+'''
+
+# Keyset pages walk idx_tasks_created_at (created_at, rowid) newest first.
+# {keyset} is "1 = 1" for the first page and the row-value bound otherwise.
+BOSS_TASKS_PAGE_QUERY = '''
+SELECT * FROM tasks
+WHERE {keyset}
+ORDER BY created_at DESC, task_id DESC
+LIMIT ?
+'''
+
+MEMBER_TASKS_PAGE_QUERY = '''
+SELECT * FROM tasks
+WHERE {keyset}
+  AND task_id IN (
+    SELECT task_id FROM task_assignments WHERE assigned_to = ?
+    UNION
+    SELECT task_id FROM tasks WHERE assigned_by = ?
+)
+ORDER BY created_at DESC, task_id DESC
+LIMIT ?
+'''
+
+KEYSET_CONDITION = "(created_at, task_id) < (?, ?)"
+
+USER_TASK_STATS_QUERY = '''
+SELECT total, completed, in_progress, pending, followup_needed
+FROM user_task_stats
+WHERE username = ?
+'''
+
+# Every member with their materialized counts (zeros for members without tasks)
+TEAM_STATS_QUERY = '''
+SELECT u.username,
+       COALESCE(s.total, 0) as total,
+       COALESCE(s.completed, 0) as completed,
+       COALESCE(s.in_progress, 0) as in_progress,
+       COALESCE(s.pending, 0) as pending,
+       COALESCE(s.followup_needed, 0) as followup_needed
+FROM users u
+LEFT JOIN user_task_stats s ON s.username = u.username
+WHERE u.role = 'member'
+ORDER BY u.username
+'''
+
+# Same counts computed from the base tables, for checking the materialized copy
+USER_TASK_STATS_RECOMPUTE_QUERY = '''
+SELECT ta.assigned_to as username,
+       COUNT(*) as total,
+       SUM(t.status = 'completed') as completed,
+       SUM(t.status = 'in_progress') as in_progress,
+       SUM(t.status = 'pending') as pending,
+       SUM(t.status = 'followup_needed') as followup_needed
+FROM tasks t
+JOIN task_assignments ta ON t.task_id = ta.task_id
+GROUP BY ta.assigned_to
+'''
+
+STAT_COLUMNS = ('total', 'completed', 'in_progress', 'pending', 'followup_needed')
+
+# Open tasks per member and due week (the Monday starting it), with how many of
+# them are already past due; one pass over tasks for the whole team
+TEAM_WORKLOAD_QUERY = '''
+SELECT ta.assigned_to as username,
+       COALESCE(date(t.due_date, 'weekday 0', '-6 days'), 'no due date') as due_week,
+       COUNT(*) as open_tasks,
+       SUM(t.due_date < ?) as overdue
+FROM tasks t
+JOIN task_assignments ta ON t.task_id = ta.task_id
+JOIN users u ON u.username = ta.assigned_to AND u.role = 'member'
+WHERE t.status != 'completed'
+GROUP BY ta.assigned_to, due_week
+'''
+
+# {filters} adds message_id cursor bounds, {order} is ASC or DESC, {limit} a LIMIT clause
+TASK_MESSAGES_QUERY = '''
+SELECT * FROM messages
+WHERE task_id = ?{filters}
+ORDER BY timestamp {order}, message_id {order}{limit}
+'''
+
+# Latest N messages (all when N < 0) of every task in {placeholders}, oldest
+# first within each task. The window partitions come straight off idx_messages_task_timestamp.
+TASKS_MESSAGES_QUERY = '''
+SELECT message_id, task_id, sender, message, timestamp, message_type
+FROM (
+    SELECT m.*,
+           ROW_NUMBER() OVER (
+               PARTITION BY m.task_id ORDER BY m.timestamp DESC, m.message_id DESC
+           ) as recent_rank
+    FROM messages m
+    WHERE m.task_id IN ({placeholders})
+)
+WHERE ? < 0 OR recent_rank <= ?
+ORDER BY task_id, timestamp, message_id
+'''
 
-        # Create tasks table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS tasks (
-            task_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            description TEXT NOT NULL,
-            assigned_by TEXT NOT NULL,
-            due_date TEXT NOT NULL,
-            status TEXT NOT NULL,
-            created_at TEXT NOT NULL
-        )
-        ''')
-
-        # Create task_assignments table (for many-to-many relationship)
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS task_assignments (
-            task_id INTEGER,
-            assigned_to TEXT,
-            PRIMARY KEY (task_id, assigned_to),
-            FOREIGN KEY (task_id) REFERENCES tasks (task_id)
-        )
-        ''')
-
-        # Create messages table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS messages (
-            message_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            task_id INTEGER,
-            sender TEXT NOT NULL,
-            message TEXT NOT NULL,
-            timestamp TEXT NOT NULL,
-            message_type TEXT,
-            FOREIGN KEY (task_id) REFERENCES tasks (task_id)
-        )
-        ''')
-
-        conn.commit()
+# Keep IN lists well under SQLite's bound-parameter limit
+MESSAGE_BATCH_SIZE = 500
+
+
+def _measured_write(operation, func, *args):
+    # Latency includes time waiting in the write queue, as users see it
+    started = time.perf_counter()
+    try:
+        result = run_write(func, *args)
+    finally:
+        write_duration.observe(time.perf_counter() - started, operation=operation)
+    task_operations.inc(operation=operation)
+    return result
 
 
 def create_task(title, description, assigned_by, assigned_to, due_date):
     """Create a new task"""
+    return _measured_write('create_task', _insert_task, title, description, assigned_by, assigned_to, due_date)
+
+
+def _insert_task(cursor, title, description, assigned_by, assigned_to, due_date):
     # Remove duplicates and keep the order
     assigned_to = list(dict.fromkeys(assigned_to))
 
-    with sqlite3.connect(DATABASE_PATH) as conn:
-        cursor = conn.cursor()
-
-        # Insert task
-        cursor.execute('''
-        INSERT INTO tasks 
-        (title, description, assigned_by, due_date, status, created_at)
-        VALUES (?, ?, ?, ?, ?, ?)
-        ''', (title, description, assigned_by, due_date, 'pending', datetime.now().isoformat()))
+    # Insert task
+    cursor.execute('''
+    INSERT INTO tasks 
+    (title, description, assigned_by, due_date, status, created_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ''', (title, description, assigned_by, due_date, 'pending', datetime.now().isoformat()))
 
-        task_id = cursor.lastrowid
+    task_id = cursor.lastrowid
 
-        # Insert task assignments
-        for assignee in assigned_to:
-            cursor.execute('''
-            INSERT OR IGNORE INTO task_assignments (task_id, assigned_to)
-            VALUES (?, ?)
-            ''', (task_id, assignee))
+    # Insert task assignments
+    cursor.executemany('''
+    INSERT OR IGNORE INTO task_assignments (task_id, assigned_to)
+    VALUES (?, ?)
+    ''', [(task_id, assignee) for assignee in assigned_to])
 
-        conn.commit()
     return task_id
 
 
 def update_task_status(task_id, status):
     """Update task status"""
-    with sqlite3.connect(DATABASE_PATH) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-        UPDATE tasks SET status = ? WHERE task_id = ?
-        ''', (status, task_id))
-        conn.commit()
+    return _measured_write('update_status', _update_task_status, task_id, status)
+
+
+def _update_task_status(cursor, task_id, status):
+    cursor.execute('''
+    UPDATE tasks SET status = ? WHERE task_id = ?
+    ''', (status, task_id))
     return True
 
 
+def create_tasks_bulk(tasks, default_assigned_by=None, chunk_size=500, progress=None):
+    """Create tasks from an iterable of dicts, one transaction per chunk; returns created ids and row errors"""
+    created = []
+    errors = []
+    chunk = []
+    rows_seen = 0
+
+    for row_number, row in enumerate(tasks, start=1):
+        rows_seen = row_number
+        try:
+            chunk.append(_normalize_task_row(row, default_assigned_by))
+        except ValueError as e:
+            errors.append((row_number, str(e)))
+
+        if len(chunk) >= chunk_size:
+            created.extend(retry_busy(lambda: _insert_task_chunk(chunk)))
+            chunk = []
+            if progress:
+                progress(rows_seen, len(created), len(errors))
+
+    if chunk:
+        created.extend(retry_busy(lambda: _insert_task_chunk(chunk)))
+    if progress:
+        progress(rows_seen, len(created), len(errors))
+
+    task_operations.inc(len(created), operation='bulk_create')
+    return {'created': created, 'errors': errors}
+
+
+def _normalize_task_row(row, default_assigned_by):
+    """Validate one bulk row and return (title, description, assigned_by, assignees, due_date, status)"""
+    if isinstance(row, ValueError):
+        # A row the reader could not parse
+        raise row
+    if not isinstance(row, dict):
+        raise ValueError(f"expected an object with task fields, got {type(row).__name__}")
+
+    def text(value):
+        return '' if value is None else str(value).strip()
+
+    title = text(row.get('title'))
+    description = text(row.get('description'))
+    assigned_by = text(row.get('assigned_by')) or text(default_assigned_by)
+    status = text(row.get('status')) or 'pending'
+    due_date = text(row.get('due_date'))
+
+    assigned_to = row.get('assigned_to') or []
+    if not isinstance(assigned_to, list):
+        assigned_to = text(assigned_to).split(',')
+    assigned_to = list(dict.fromkeys(text(name) for name in assigned_to if text(name)))
+
+    missing = [name for name, value in [('title', title), ('description', description),
+                                        ('assigned_by', assigned_by), ('assigned_to', assigned_to),
+                                        ('due_date', due_date)] if not value]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+    if status not in TASK_STATUSES:
+        raise ValueError(f"unknown status '{status}'")
+    try:
+        due_date = date.fromisoformat(due_date).isoformat()
+    except ValueError:
+        raise ValueError(f"due_date '{due_date}' is not YYYY-MM-DD") from None
+
+    return title, description, assigned_by, assigned_to, due_date, status
+
+
+def _insert_task_chunk(rows):
+    """Insert normalized rows in one transaction and return their task ids"""
+    with write_connection() as conn:
+        cursor = conn.cursor()
+        begin_immediate(conn)
+
+        # AUTOINCREMENT hands out max(seq, max rowid) + 1, + 2, ... and we hold
+        # the write lock, so the chunk's ids are known without a lastrowid per row
+        cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'tasks'")
+        seq = cursor.fetchone()
+        cursor.execute("SELECT MAX(task_id) FROM tasks")
+        first_id = max(seq[0] if seq else 0, cursor.fetchone()[0] or 0) + 1
+
+        created_at = datetime.now().isoformat()
+        cursor.executemany('''
+        INSERT INTO tasks
+        (title, description, assigned_by, due_date, status, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ''', [(title, description, assigned_by, due_date, status, created_at)
+              for title, description, assigned_by, _, due_date, status in rows])
+
+        task_ids = list(range(first_id, first_id + len(rows)))
+        cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'tasks'")
+        if cursor.fetchone()[0] != task_ids[-1]:
+            raise sqlite3.DatabaseError("tasks ids were not allocated contiguously")
+
+        cursor.executemany('''
+        INSERT OR IGNORE INTO task_assignments (task_id, assigned_to)
+        VALUES (?, ?)
+        ''', [(task_id, assignee)
+              for task_id, row in zip(task_ids, rows) for assignee in row[3]])
+    return task_ids
+
+
+class TaskTransaction:
+    """
+    Task operations that share one connection and one commit
+
+    Obtained from task_transaction(); every call runs on the same cursor, and
+    nothing is visible to other sessions until the block exits cleanly.
+    """
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def create_task(self, title, description, assigned_by, assigned_to, due_date):
+        return _insert_task(self.cursor, title, description, assigned_by, assigned_to, due_date)
 
+    def update_task_status(self, task_id, status):
+        return _update_task_status(self.cursor, task_id, status)
 
+    def create_message(self, task_id, sender, message, message_type='user'):
+        return _insert_message(self.cursor, task_id, sender, message, message_type)
+
+
+@contextmanager
+def task_transaction():
+    """
+    Compose several task operations into one atomic transaction
+
+    Usage:
+        with task_transaction() as tx:
+            task_id = tx.create_task(...)
+            tx.create_message(task_id, ...)
+
+    Commits once when the block exits; any exception rolls everything back.
+    """
+    nested = in_write_transaction()
+    with write_connection() as conn:
+        if not nested:
+            begin_immediate(conn)
+        yield TaskTransaction(conn.cursor())
+
+
+@traced(kind='fetch')
+@cached_query()
 def get_user_tasks(username, role):
     """Retrieve tasks for a user with message count, sorted by most recent first"""
-    with sqlite3.connect(DATABASE_PATH) as conn:
-        conn.row_factory = sqlite3.Row
+    with read_connection() as conn:
         cursor = conn.cursor()
 
         if role == 'boss':
-            # Boss sees all tasks, sorted by creation date in descending order
-            cursor.execute('''
-            SELECT t.*, 
-                   GROUP_CONCAT(DISTINCT ta.assigned_to) as assigned_users,
-                   COUNT(m.message_id) as message_count
-            FROM tasks t
-            LEFT JOIN task_assignments ta ON t.task_id = ta.task_id
-            LEFT JOIN messages m ON t.task_id = m.task_id
-            GROUP BY t.task_id
-            ORDER BY t.created_at DESC
-            ''')
+            # Boss sees all tasks, sorted by creation date in descending order.
+            # message_count and assigned_users are maintained by triggers, so
+            # this touches one row per task regardless of chat volume.
+            cursor.execute(BOSS_TASKS_QUERY)
+        else:
+            # Member sees tasks they are assigned to or assigned by, sorted by creation date.
+            # The OR is split into a UNION so each branch can use its own index.
+            cursor.execute(MEMBER_TASKS_QUERY, (username, username))
+
+        return {str(row['task_id']): _task_from_row(row) for row in cursor.fetchall()}
+
+
+@traced(kind='fetch')
+@cached_query()
+def get_user_tasks_page(username, role, after=None, limit=25):
+    """Retrieve a page of tasks after the (created_at, task_id) cursor; returns (tasks, next cursor or None)"""
+    keyset = KEYSET_CONDITION if after else "1 = 1"
+    params = list(after) if after else []
+
+    with read_connection() as conn:
+        cursor = conn.cursor()
+        if role == 'boss':
+            cursor.execute(BOSS_TASKS_PAGE_QUERY.format(keyset=keyset), params + [limit])
         else:
-            # Member sees tasks they are assigned to or assigned by, sorted by creation date
-            cursor.execute('''
-            SELECT t.*, 
-                   GROUP_CONCAT(DISTINCT ta.assigned_to) as assigned_users,
-                   COUNT(m.message_id) as message_count
-            FROM tasks t
-            JOIN task_assignments ta ON t.task_id = ta.task_id
-            LEFT JOIN messages m ON t.task_id = m.task_id
-            WHERE ta.assigned_to = ? OR t.assigned_by = ?
-            GROUP BY t.task_id
-            ORDER BY t.created_at DESC
-            ''', (username, username))
-
-        tasks = {}
-        for row in cursor.fetchall():
-            tasks[str(row['task_id'])] = {
-                'title': row['title'],
-                'description': row['description'],
-                'assigned_by': row['assigned_by'],
-                'assigned_to': list(set(row['assigned_users'].split(','))),
-                'due_date': row['due_date'],
-                'status': row['status'],
-                'message_count': row['message_count']
-            }
-        return tasks
+            cursor.execute(MEMBER_TASKS_PAGE_QUERY.format(keyset=keyset), params + [username, username, limit])
+        rows = cursor.fetchall()
+
+    tasks = {str(row['task_id']): _task_from_row(row) for row in rows}
+    next_cursor = (rows[-1]['created_at'], rows[-1]['task_id']) if len(rows) == limit else None
+    return tasks, next_cursor
+
+
+@traced(kind='fetch')
+def get_task(task_id):
+    """Retrieve a single task in the dashboard dict shape, or None if it does not exist"""
+    with read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM tasks WHERE task_id = ?", (task_id,))
+        row = cursor.fetchone()
+    return _task_from_row(row) if row else None
+
 
+def _task_from_row(row):
+    """Convert a tasks row into the dict shape used by the dashboard"""
+    return {
+        'title': row['title'],
+        'description': row['description'],
+        'assigned_by': row['assigned_by'],
+        'assigned_to': json.loads(row['assigned_users']),
+        'due_date': row['due_date'],
+        'status': row['status'],
+        'message_count': row['message_count']
+    }
 
 
+@traced(kind='fetch')
+@cached_query()
 def get_user_task_stats(username):
     """Get task statistics for a user"""
-    with sqlite3.connect(DATABASE_PATH) as conn:
+    with read_connection() as conn:
         cursor = conn.cursor()
 
-        cursor.execute('''
-        SELECT 
-            COUNT(*) as total,
-            SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END) as completed,
-            SUM(CASE WHEN status = 'in_progress' THEN 1 ELSE 0 END) as in_progress,
-            SUM(CASE WHEN status = 'pending' THEN 1 ELSE 0 END) as pending,
-            SUM(CASE WHEN status = 'followup_needed' THEN 1 ELSE 0 END) as followup_needed
-        FROM tasks t
-        JOIN task_assignments ta ON t.task_id = ta.task_id
-        WHERE ta.assigned_to = ?
-        ''', (username,))
+        cursor.execute(USER_TASK_STATS_QUERY, (username,))
 
         stats = cursor.fetchone()
+        if stats is None:
+            return dict.fromkeys(STAT_COLUMNS, 0)
+        return {column: stats[column] for column in STAT_COLUMNS}
+
+
+@traced(kind='fetch')
+@cached_query()
+def get_team_stats():
+    """
+    Task statistics for every team member in one query
+
+    Returns:
+        Dict mapping username to the same counts as get_user_task_stats
+    """
+    with read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(TEAM_STATS_QUERY)
         return {
-            'total': stats[0],
-            'completed': stats[1],
-            'in_progress': stats[2],
-            'pending': stats[3],
-            'followup_needed': stats[4]
+            row['username']: {column: row[column] for column in STAT_COLUMNS}
+            for row in cursor.fetchall()
         }
 
 
+@traced(kind='fetch')
+@cached_query()
+def get_team_workload(today):
+    """
+    Open task counts for every member, grouped by due week
+
+    Args:
+        today: ISO date string; open tasks due before it count as overdue
+
+    Returns:
+        List of (username, due_week, open_tasks, overdue) tuples
+    """
+    with read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(TEAM_WORKLOAD_QUERY, (today,))
+        return [tuple(row) for row in cursor.fetchall()]
+
+
+def check_user_task_stats():
+    """
+    Compare user_task_stats against counts recomputed from tasks and task_assignments
+
+    Returns:
+        List of (username, stored, expected) tuples for every user whose
+        counts differ; stored or expected is None when the row is missing
+    """
+    with read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT username, {', '.join(STAT_COLUMNS)} FROM user_task_stats")
+        stored = {row['username']: tuple(row[c] for c in STAT_COLUMNS) for row in cursor.fetchall()}
+        cursor.execute(USER_TASK_STATS_RECOMPUTE_QUERY)
+        expected = {row['username']: tuple(row[c] for c in STAT_COLUMNS) for row in cursor.fetchall()}
+
+    zeros = (0,) * len(STAT_COLUMNS)
+    mismatches = []
+    for username in sorted(stored.keys() | expected.keys()):
+        have = stored.get(username)
+        want = expected.get(username)
+        # A stored row of zeros is what a user keeps after losing all assignments
+        if (have or zeros) != (want or zeros):
+            mismatches.append((
+                username,
+                dict(zip(STAT_COLUMNS, have)) if have else None,
+                dict(zip(STAT_COLUMNS, want)) if want else None
+            ))
+    return mismatches
+
+
+def rebuild_user_task_stats():
+    """Recompute user_task_stats from scratch, returning the number of users written"""
+    return run_write(_rebuild_user_task_stats)
+
+
+def _rebuild_user_task_stats(cursor):
+    cursor.execute("DELETE FROM user_task_stats")
+    cursor.execute(USER_TASK_STATS_REBUILD)
+    return cursor.rowcount
+
+
 def create_message(task_id, sender, message, message_type='user'):
     """Create a new message for a specific task"""
-    with sqlite3.connect(DATABASE_PATH) as conn:
-        cursor = conn.cursor()
-        # If it's a system message, prepend the sender to the message
-        if message_type == 'system':
-            message = f"{sender} updated: {message}"
-
-        cursor.execute('''
-        INSERT INTO messages 
-        (task_id, sender, message, timestamp, message_type)
-        VALUES (?, ?, ?, ?, ?)
-        ''', (task_id, sender, message, datetime.now().isoformat(), message_type))
-        conn.commit()
+    return _measured_write('create_message', _insert_message, task_id, sender, message, message_type)
+
+
+def _insert_message(cursor, task_id, sender, message, message_type='user'):
+    # If it's a system message, prepend the sender to the message
+    if message_type == 'system':
+        message = f"{sender} updated: {message}"
+
+    cursor.execute('''
+    INSERT INTO messages 
+    (task_id, sender, message, timestamp, message_type)
+    VALUES (?, ?, ?, ?, ?)
+    ''', (task_id, sender, message, datetime.now().isoformat(), message_type))
     return True
 
-def get_task_messages(task_id):
-    """Retrieve all messages for a specific task"""
-    with sqlite3.connect(DATABASE_PATH) as conn:
-        conn.row_factory = sqlite3.Row
+
+@traced(kind='fetch')
+def get_task_messages(task_id, since_message_id=None, last_n=None, before_message_id=None):
+    """Retrieve messages for a specific task oldest first, optionally only newer/older than an id or the last N"""
+    filters = ""
+    params = [task_id]
+    if since_message_id is not None:
+        filters += " AND message_id > ?"
+        params.append(since_message_id)
+    if before_message_id is not None:
+        filters += " AND message_id < ?"
+        params.append(before_message_id)
+
+    if last_n is None:
+        query = TASK_MESSAGES_QUERY.format(filters=filters, order="ASC", limit="")
+    else:
+        # Walk the index newest first and stop after N rows
+        query = TASK_MESSAGES_QUERY.format(filters=filters, order="DESC", limit=" LIMIT ?")
+        params.append(last_n)
+
+    with read_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute('''
-        SELECT * FROM messages 
-        WHERE task_id = ? 
-        ORDER BY timestamp
-        ''', (task_id,))
+        cursor.execute(query, params)
         messages = [dict(row) for row in cursor.fetchall()]
-    return messages
\ No newline at end of file
+
+    if last_n is not None:
+        messages.reverse()
+    return messages
+
+
+@traced(kind='fetch')
+@cached_query()
+def get_messages_for_tasks(task_ids, per_task_limit=None):
+    """Retrieve messages of several tasks at once, newest per_task_limit each, keyed by str(task_id)"""
+    task_ids = list(dict.fromkeys(str(task_id) for task_id in task_ids))
+    messages = {task_id: [] for task_id in task_ids}
+    limit = per_task_limit if per_task_limit is not None else -1
+
+    with read_connection() as conn:
+        cursor = conn.cursor()
+        for start in range(0, len(task_ids), MESSAGE_BATCH_SIZE):
+            batch = task_ids[start:start + MESSAGE_BATCH_SIZE]
+            query = TASKS_MESSAGES_QUERY.format(placeholders=', '.join('?' for _ in batch))
+            cursor.execute(query, [int(task_id) for task_id in batch] + [limit, limit])
+            for row in cursor.fetchall():
+                messages[str(row['task_id'])].append(dict(row))
+    return messages
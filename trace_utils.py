@@ -0,0 +1,188 @@
+import cProfile
+import marshal
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from config import RERUN_LATENCY_SAMPLES
+
+# Upper bounds (ms) of the rerun latency histogram buckets
+LATENCY_BUCKETS = (10, 25, 50, 100, 250, 500, 1000, 2500, float('inf'))
+
+_local = threading.local()
+
+
+class Span:
+    """One timed section of a rerun; self_time excludes nested spans"""
+
+    __slots__ = ('name', 'kind', 'started', 'duration', 'child_time')
+
+    def __init__(self, name, kind, started):
+        self.name = name
+        self.kind = kind
+        self.started = started
+        self.duration = 0.0
+        self.child_time = 0.0
+
+    @property
+    def self_time(self):
+        return self.duration - self.child_time
+
+
+class Trace:
+    """Spans recorded on one thread during a single script rerun"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.duration = None
+        self.spans = []
+        self._open = []
+
+    def breakdown(self):
+        """Seconds spent per span kind, plus 'other' for time outside any span"""
+        totals = {}
+        for span in self.spans:
+            totals[span.kind] = totals.get(span.kind, 0.0) + span.self_time
+        if self.duration is not None:
+            totals['other'] = max(self.duration - sum(totals.values()), 0.0)
+        return totals
+
+    def by_name(self):
+        """Dict of span name to (calls, total seconds, self seconds)"""
+        totals = {}
+        for span in self.spans:
+            calls, total, own = totals.get(span.name, (0, 0.0, 0.0))
+            totals[span.name] = (calls + 1, total + span.duration, own + span.self_time)
+        return totals
+
+
+def start_trace():
+    """Begin collecting spans for a rerun on the calling thread"""
+    _local.trace = Trace()
+    return _local.trace
+
+
+def finish_trace():
+    """Stop collecting spans on the calling thread and return the finished trace"""
+    trace = getattr(_local, 'trace', None)
+    _local.trace = None
+    if trace is not None:
+        trace.duration = time.perf_counter() - trace.started
+    return trace
+
+
+@contextmanager
+def span(name, kind='render'):
+    """
+    Time a section of the current rerun
+
+    kind groups spans in the breakdown, e.g. 'fetch' for database reads and
+    'render' for building and emitting page elements. Outside a trace this
+    does nothing.
+    """
+    trace = getattr(_local, 'trace', None)
+    if trace is None:
+        yield
+        return
+
+    current = Span(name, kind, time.perf_counter())
+    trace._open.append(current)
+    try:
+        yield
+    finally:
+        trace._open.pop()
+        current.duration = time.perf_counter() - current.started
+        if trace._open:
+            trace._open[-1].child_time += current.duration
+        trace.spans.append(current)
+
+
+def traced(kind='render', name=None):
+    """Decorator wrapping every call of a function in a span"""
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if getattr(_local, 'trace', None) is None:
+                return func(*args, **kwargs)
+            with span(span_name, kind):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Only one cProfile profiler can be active per process (enable() raises
+# ValueError on Python 3.12+), so a rerun that finds one running goes unprofiled
+_profile_lock = threading.Lock()
+
+
+@contextmanager
+def profiled():
+    """
+    Run the block under cProfile
+
+    Yields a dict whose 'profile' key receives the .prof file content
+    (readable with pstats or snakeviz) when the block exits, including by
+    an exception such as Streamlit's rerun signal. It stays None when
+    another profiler is already running; the block then runs unprofiled.
+    """
+    result = {'profile': None}
+    if not _profile_lock.acquire(blocking=False):
+        yield result
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # A profiler outside this module (e.g. a debugger) holds the hook
+        _profile_lock.release()
+        yield result
+        return
+    try:
+        yield result
+    finally:
+        profiler.disable()
+        _profile_lock.release()
+        profiler.create_stats()
+        result['profile'] = marshal.dumps(profiler.stats)
+
+
+class LatencyRecorder:
+    """Recent rerun durations per label (e.g. menu item), shared by all sessions"""
+
+    def __init__(self, samples=500):
+        self.samples = samples
+        self._latencies = {}
+        self._lock = threading.Lock()
+
+    def record(self, label, seconds):
+        with self._lock:
+            self._latencies.setdefault(label, deque(maxlen=self.samples)).append(seconds)
+
+    def percentiles(self):
+        """Dict of label to count, p50, p95 and max, in seconds"""
+        with self._lock:
+            snapshot = {label: sorted(values) for label, values in self._latencies.items()}
+        return {
+            label: {
+                'count': len(values),
+                'p50': values[int(0.50 * (len(values) - 1))],
+                'p95': values[int(0.95 * (len(values) - 1))],
+                'max': values[-1]
+            }
+            for label, values in snapshot.items() if values
+        }
+
+    def histogram(self, label):
+        """Rerun counts per LATENCY_BUCKETS bucket for label"""
+        with self._lock:
+            values = list(self._latencies.get(label, ()))
+        counts = [0] * len(LATENCY_BUCKETS)
+        for seconds in values:
+            counts[next(i for i, bound in enumerate(LATENCY_BUCKETS) if seconds * 1000 <= bound)] += 1
+        return counts
+
+
+rerun_latencies = LatencyRecorder(RERUN_LATENCY_SAMPLES)